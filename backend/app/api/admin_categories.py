@@ -6,6 +6,10 @@ from app.models.user import User
 from app.models.category import Category
 from app.models.product import Product
 from app.schemas.category import CategoryResponse, CategoryCreate, CategoryUpdate
+from app.services.catalog import refresh_categories
+from app.services.categories import (
+    add_category_closure, move_category_subtree, remove_category_closure, is_descendant
+)
 
 router = APIRouter(prefix="/api/admin/categories", tags=["admin-categories"])
 
@@ -71,8 +75,11 @@ def create_category(
     
     category = Category(**data.model_dump())
     db.add(category)
+    db.flush()
+    add_category_closure(db, category)
     db.commit()
     db.refresh(category)
+    refresh_categories(db, category.id)
     return category
 
 
@@ -96,16 +103,7 @@ def update_category(
     # Проверка: нельзя сделать родителем дочернюю категорию (циклическая зависимость)
     if "parent_id" in update_data and update_data["parent_id"]:
         # Проверяем, не является ли новый родитель дочерней категорией текущей
-        def is_descendant(parent_id, child_id, db):
-            """Проверяет, является ли child_id потомком parent_id"""
-            child = db.get(Category, child_id)
-            if not child or not child.parent_id:
-                return False
-            if child.parent_id == parent_id:
-                return True
-            return is_descendant(parent_id, child.parent_id, db)
-        
-        if is_descendant(category_id, update_data["parent_id"], db):
+        if is_descendant(db, category_id, update_data["parent_id"]):
             raise HTTPException(status_code=400, detail="Cannot set a descendant category as parent")
     
     # Проверка slug
@@ -116,12 +114,19 @@ def update_category(
         if existing:
             raise HTTPException(status_code=400, detail="Slug already exists")
     
+    # Перенос поддерева — set-based обновление таблицы замыкания
+    if "parent_id" in update_data and update_data["parent_id"] != category.parent_id:
+        move_category_subtree(db, category_id, update_data["parent_id"])
+    
     for key, value in update_data.items():
         setattr(category, key, value)
     
     db.add(category)
     db.commit()
     db.refresh(category)
+    
+    # Акции по категории зависят от товаров категории; дерево — в индексе каталога
+    refresh_categories(db, category_id)
     return category
 
 
@@ -135,7 +140,9 @@ def delete_category(
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
+    remove_category_closure(db, category_id)
     db.delete(category)
     db.commit()
+    refresh_categories(db, category_id)
     return {"message": "Category deleted"}
 
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
-from sqlmodel import Session, select, col
+from sqlmodel import Session, select, col, func
 from typing import List, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime
@@ -16,9 +16,14 @@ from app.schemas.product import (
     ProductDetailResponse, ProductCreate, ProductUpdate,
     ProductImageResponse, ProductImageUpdate,
     BulkPriceUpdate, BulkActiveUpdate, BulkStockUpdate,
-    ProductListResponse
+    AdminProductListResponse, ProductResponse
 )
 from app.services.pricing import build_product_detail_response
+from app.services.product_cards import load_product_cards
+from app.services.promotion_targets import promotion_products_condition
+from app.services.fieldsets import parse_fields, partial_model, partial_list_model, fields_response
+from app.services.catalog import refresh_catalog, refresh_products, refresh_product_images
+from app.services.search import build_match_query, search_condition
 
 router = APIRouter(prefix="/api/admin/products", tags=["admin-products"])
 
@@ -110,7 +115,7 @@ def process_uploaded_image(file: UploadFile, max_size: int = 2000, quality: int
 
 # === CRUD Products ===
 
-@router.get("/", response_model=ProductListResponse)
+@router.get("/", response_model=AdminProductListResponse)
 def list_products(
     page: int = 1,
     page_size: int = 20,
@@ -118,20 +123,20 @@ def list_products(
     category_id: Optional[int] = Query(None),
     in_stock: Optional[bool] = Query(None),
     is_active: Optional[bool] = Query(None),
+    promotion_id: Optional[int] = Query(None, description="Only products the promotion applies to"),
+    fields: Optional[str] = Query(None, description="Comma-separated item fields, e.g. id,name,final_price"),
     db: Session = Depends(get_db),
     _: User = Depends(admin_required)
 ):
     """Все продукты (админ) с фильтрами"""
-    stmt = select(Product)
+    item_fields = parse_fields(fields, ProductResponse)
+    stmt = select(Product.id)
     
-    # Search
+    # Search: нормализованный полнотекстовый индекс (название и бренд, без описания) + артикул
     if q:
-        search = f"%{q}%"
-        stmt = stmt.where(
-            (col(Product.name).ilike(search)) |
-            (col(Product.sku).ilike(search)) |
-            (col(Product.brand).ilike(search))
-        )
+        match = build_match_query(q, columns=("name", "brand"))
+        sku_condition = col(Product.sku).ilike(f"%{q}%")
+        stmt = stmt.where(search_condition(match) | sku_condition if match else sku_condition)
     
     # Category filter
     if category_id:
@@ -145,30 +150,44 @@ def list_products(
     if is_active is not None:
         stmt = stmt.where(Product.is_active == is_active)
     
+    # Товары акции — JOIN по promotion_targets
+    if promotion_id:
+        stmt = stmt.where(promotion_products_condition(db, promotion_id))
+    
     stmt = stmt.order_by(Product.id.desc())
-    all_products = db.exec(stmt).all()
-    total = len(all_products)
+    total = db.exec(select(func.count()).select_from(stmt.order_by(None).subquery())).one()
     
     offset = (page - 1) * page_size
-    products = all_products[offset:offset + page_size]
+    product_ids = list(db.exec(stmt.offset(offset).limit(page_size)).all())
     
-    items = [build_product_detail_response(p, db) for p in products]
+    items, _ = load_product_cards(db, product_ids, detail=True, fields=item_fields)
     
-    return ProductListResponse(
+    result = dict(
         items=items,
         total=total,
         page=page,
         page_size=page_size,
         pages=ceil(total / page_size) if total > 0 else 1
     )
+    if item_fields is not None:
+        return fields_response(partial_list_model(AdminProductListResponse, ProductResponse, item_fields), result)
+    return result
 
 
 @router.get("/{product_id}", response_model=ProductDetailResponse)
 def get_product(
     product_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,name,final_price"),
     db: Session = Depends(get_db),
     _: User = Depends(admin_required)
 ):
+    detail_fields = parse_fields(fields, ProductDetailResponse)
+    if detail_fields is not None:
+        items, _ = load_product_cards(db, [product_id], detail=True, fields=detail_fields)
+        if not items:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return fields_response(partial_model(ProductDetailResponse, detail_fields), items[0])
+    
     product = db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -196,6 +215,7 @@ def create_product(
     db.add(product)
     db.commit()
     db.refresh(product)
+    refresh_products(db, [product.id])
     return build_product_detail_response(product, db)
 
 
@@ -233,6 +253,7 @@ def update_product(
     db.add(product)
     db.commit()
     db.refresh(product)
+    refresh_products(db, [product.id])
     return build_product_detail_response(product, db)
 
 
@@ -259,6 +280,7 @@ def delete_product(
     
     db.delete(product)
     db.commit()
+    refresh_products(db, [product_id])
     return {"message": "Product deleted"}
 
 
@@ -316,6 +338,7 @@ async def upload_image(
     db.add(image)
     db.commit()
     db.refresh(image)
+    refresh_product_images(db, product_id)
     
     return image
 
@@ -349,6 +372,7 @@ def update_image(
     db.add(image)
     db.commit()
     db.refresh(image)
+    refresh_product_images(db, product_id)
     return image
 
 
@@ -371,6 +395,7 @@ def delete_image(
     
     db.delete(image)
     db.commit()
+    refresh_product_images(db, product_id)
     return {"message": "Image deleted"}
 
 
@@ -418,6 +443,7 @@ def bulk_price_update(
         updated += 1
     
     db.commit()
+    refresh_catalog(db, [p.id for p in products])
     return {"message": f"Updated {updated} products"}
 
 
@@ -437,6 +463,7 @@ def bulk_active_update(
         db.add(product)
     
     db.commit()
+    refresh_catalog(db, [p.id for p in products])
     return {"message": f"Updated {len(products)} products"}
 
 
@@ -447,7 +474,7 @@ def bulk_stock_update(
     _: User = Depends(admin_required)
 ):
     """Массовое обновление наличия"""
-    updated = 0
+    updated_ids = []
     
     for item in data.updates:
         product = db.get(Product, item.get("product_id"))
@@ -455,8 +482,9 @@ def bulk_stock_update(
             product.in_stock = item.get("in_stock", True)
             product.updated_at = datetime.utcnow()
             db.add(product)
-            updated += 1
+            updated_ids.append(product.id)
     
     db.commit()
-    return {"message": f"Updated {updated} products"}
+    refresh_catalog(db, updated_ids)
+    return {"message": f"Updated {len(updated_ids)} products"}
 
@@ -7,6 +7,7 @@ from pydantic import BaseModel
 from app.api.deps import get_db, admin_required
 from app.models.user import User
 from app.models.order import Order, OrderStatus, OrderItem
+from app.services.response_cache import response_cache, response_flight
 
 router = APIRouter(prefix="/api/admin/stats", tags=["admin-stats"])
 
@@ -157,3 +158,9 @@ def get_stats(
         top_products_qty=top_products_qty,
         sales_by_day=sales_by_day
     )
+
+
+@router.get("/cache")
+def get_cache_stats(_: User = Depends(admin_required)):
+    """Счётчики кэша ответов каталога и схлопывания параллельных запросов"""
+    return {**response_cache.stats(), "single_flight": response_flight.stats()}
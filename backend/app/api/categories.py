@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlmodel import Session, select
 from typing import List
-from app.api.deps import get_db
+from app.api.deps import get_db, catalog_conditional_get
 from app.models.category import Category
 from app.schemas.category import CategoryResponse
+from app.services.response_cache import cached_json_response
 
 router = APIRouter(prefix="/api/categories", tags=["categories"])
 
 
 @router.get("/", response_model=List[CategoryResponse])
-def list_categories(db: Session = Depends(get_db)):
+def list_categories(
+    request: Request,
+    response: Response,
+    version: int = Depends(catalog_conditional_get),
+    db: Session = Depends(get_db)
+):
     """Список активных категорий"""
     stmt = select(Category).where(Category.is_active == True).order_by(Category.sort_order)
-    categories = db.exec(stmt).all()
-    return categories
+    return cached_json_response(
+        "categories.list", request, response, version, List[CategoryResponse],
+        lambda: db.exec(stmt).all(),
+    )
 
 
 
@@ -1,9 +1,13 @@
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status, Request, Response
 from fastapi_jwt import JwtAccessBearerCookie, JwtAuthorizationCredentials
 from sqlmodel import Session, select
 from app.db.session import engine
 from app.models.user import User, UserRole
 from app.core.config import settings
+from app.services.catalog_version import (
+    get_catalog_version, catalog_etag, catalog_last_modified, is_not_modified
+)
+from app.services.sales import SALES_SORTS
 
 # JWT с HttpOnly cookie
 access_security = JwtAccessBearerCookie(
@@ -68,3 +72,46 @@ async def admin_required(
         )
     return current_user
 
+
+def catalog_conditional_get(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+) -> int:
+    """
+    Условный GET для публичных данных каталога: ETag/Last-Modified по версии
+    каталога, 304 до выполнения обработчика. Возвращает версию каталога;
+    для sort=popular/trending — с учётом порядка по продажам.
+    """
+    sales = request.query_params.get("sort") in SALES_SORTS
+    return _conditional_get(request, response, db, sales)
+
+
+def catalog_sales_conditional_get(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+) -> int:
+    """Как catalog_conditional_get, для ответов, всегда зависящих от продаж (главная)"""
+    return _conditional_get(request, response, db, True)
+
+
+def _conditional_get(request: Request, response: Response, db: Session, sales: bool) -> int:
+    version = get_catalog_version(db, sales)
+    headers = {
+        "ETag": catalog_etag(version),
+        "Last-Modified": catalog_last_modified(sales),
+        # Кэшировать можно, но каждый раз с ревалидацией
+        "Cache-Control": "public, no-cache",
+    }
+    
+    if is_not_modified(
+        headers["ETag"],
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since"),
+        sales,
+    ):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    return version
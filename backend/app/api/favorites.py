@@ -6,7 +6,7 @@ from app.api.deps import get_db, get_current_user
 from app.models.user import User
 from app.models.favorite import Favorite
 from app.models.product import Product
-from app.services.pricing import build_product_response
+from app.services.product_cards import load_product_cards
 from app.schemas.product import ProductResponse
 
 router = APIRouter(prefix="/api/me/favorites", tags=["favorites"])
@@ -22,14 +22,13 @@ def get_favorites(
     current_user: User = Depends(get_current_user)
 ):
     """Список избранных товаров"""
-    stmt = select(Favorite).where(Favorite.user_id == current_user.id)
-    favorites = db.exec(stmt).all()
-    
-    products = []
-    for fav in favorites:
-        if fav.product and fav.product.is_active:
-            products.append(build_product_response(fav.product, db))
-    
+    stmt = (
+        select(Favorite.product_id)
+        .join(Product, Product.id == Favorite.product_id)
+        .where(Favorite.user_id == current_user.id, Product.is_active == True)
+        .order_by(Favorite.id)
+    )
+    products, _ = load_product_cards(db, list(db.exec(stmt).all()))
     return products
 
 
@@ -52,14 +51,13 @@ def add_favorite(
         )
     ).first()
     
-    if existing:
-        return build_product_response(product, db)
-    
-    favorite = Favorite(user_id=current_user.id, product_id=data.product_id)
-    db.add(favorite)
-    db.commit()
+    if not existing:
+        favorite = Favorite(user_id=current_user.id, product_id=data.product_id)
+        db.add(favorite)
+        db.commit()
     
-    return build_product_response(product, db)
+    products, _ = load_product_cards(db, [data.product_id])
+    return products[0]
 
 
 @router.delete("/{product_id}")
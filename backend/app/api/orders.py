@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import load_only, selectinload
 from sqlmodel import Session, select, col
 from typing import Optional, List
 from datetime import datetime, date
@@ -9,6 +10,11 @@ from app.models.order import Order, OrderStatus, OrderItem
 from app.models.product import Product
 from app.schemas.order import OrderCreate, OrderResponse, OrderListResponse, OrderStatusUpdate, OrderItemResponse
 from app.services.orders import create_order
+from app.services.sales import counts_as_sale, record_order_sales
+from app.services.co_purchase import record_order_co_purchases
+from app.services.fieldsets import parse_fields, partial_model, partial_list_model, fields_response
+
+FIELDS_DESCRIPTION = "Comma-separated fields, e.g. id,order_number,status,total"
 
 router = APIRouter(tags=["orders"])
 
@@ -31,28 +37,44 @@ def create_new_order(
 
 @router.get("/api/me/orders", response_model=List[OrderResponse])
 def get_my_orders(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Список моих заказов"""
-    stmt = select(Order).where(Order.user_id == current_user.id).order_by(Order.created_at.desc())
+    order_fields = parse_fields(fields, OrderResponse)
+    stmt = (
+        select(Order)
+        .where(Order.user_id == current_user.id)
+        .order_by(Order.created_at.desc())
+        .options(*order_load_options(order_fields))
+    )
     orders = db.exec(stmt).all()
-    return [build_order_response(order, db) for order in orders]
+    result = [build_order_response(order, db, order_fields) for order in orders]
+    if order_fields is not None:
+        return fields_response(List[partial_model(OrderResponse, order_fields)], result)
+    return result
 
 
 @router.get("/api/me/orders/{order_id}", response_model=OrderResponse)
 def get_my_order(
     order_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Детали моего заказа"""
-    order = db.get(Order, order_id)
+    order_fields = parse_fields(fields, OrderResponse)
+    order = db.exec(
+        select(Order)
+        .where(Order.id == order_id, Order.user_id == current_user.id)
+        .options(*order_load_options(order_fields))
+    ).first()
     
-    if not order or order.user_id != current_user.id:
+    if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    return build_order_response(order, db)
+    return order_response(order, db, order_fields)
 
 
 # === Admin: управление заказами ===
@@ -65,11 +87,13 @@ def admin_list_orders(
     date_to: Optional[date] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
     _: User = Depends(admin_required)
 ):
     """Список заказов с фильтрами (админ)"""
-    stmt = select(Order)
+    order_fields = parse_fields(fields, OrderResponse)
+    stmt = select(Order).options(*order_load_options(order_fields))
     
     if status:
         stmt = stmt.where(Order.status == status)
@@ -98,20 +122,51 @@ def admin_list_orders(
     orders = all_orders[offset:offset + page_size]
     
     # Строим ответы с изображениями товаров
-    orders_with_images = [build_order_response(order, db) for order in orders]
+    orders_with_images = [build_order_response(order, db, order_fields) for order in orders]
     
-    return OrderListResponse(
+    result = dict(
         items=orders_with_images,
         total=total,
         page=page,
         page_size=page_size
     )
+    if order_fields is not None:
+        return fields_response(partial_list_model(OrderListResponse, OrderResponse, order_fields), result)
+    return result
+
+
+def order_load_options(fields: Optional[List[str]]) -> list:
+    """Опции загрузки заказа: для sparse fieldsets — только нужные колонки и позиции"""
+    if fields is None:
+        return []
+    columns = [getattr(Order, name) for name in fields if name != "items"]
+    options = [load_only(*columns)]
+    if "items" in fields:
+        options.append(selectinload(Order.items))
+    return options
+
+
+def order_response(order: Order, db: Session, fields: Optional[List[str]]):
+    """Ответ с одним заказом: полный или по fields"""
+    if fields is not None:
+        return fields_response(partial_model(OrderResponse, fields), build_order_response(order, db, fields))
+    return build_order_response(order, db)
 
 
-def build_order_response(order: Order, db: Session) -> dict:
-    """Построить ответ заказа с изображениями товаров"""
-    order_dict = order.model_dump()
+def build_order_response(order: Order, db: Session, fields: Optional[List[str]] = None) -> dict:
+    """Построить ответ заказа с изображениями товаров (fields — только эти поля)"""
+    if fields is not None:
+        order_dict = {name: getattr(order, name) for name in fields if name != "items"}
+        if "items" in fields:
+            order_dict["items"] = _order_items_with_images(order, db)
+        return order_dict
     
+    order_dict = order.model_dump()
+    order_dict['items'] = _order_items_with_images(order, db)
+    return OrderResponse(**order_dict)
+
+
+def _order_items_with_images(order: Order, db: Session) -> List[OrderItemResponse]:
     # Получаем изображения товаров для каждого элемента заказа
     items_with_images = []
     for item in order.items:
@@ -134,22 +189,25 @@ def build_order_response(order: Order, db: Session) -> dict:
         
         items_with_images.append(OrderItemResponse(**item_dict))
     
-    order_dict['items'] = items_with_images
-    return OrderResponse(**order_dict)
+    return items_with_images
 
 
 @router.get("/api/admin/orders/{order_id}", response_model=OrderResponse)
 def admin_get_order(
     order_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
     _: User = Depends(admin_required)
 ):
     """Детали заказа (админ)"""
-    order = db.get(Order, order_id)
+    order_fields = parse_fields(fields, OrderResponse)
+    order = db.exec(
+        select(Order).where(Order.id == order_id).options(*order_load_options(order_fields))
+    ).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    return build_order_response(order, db)
+    return order_response(order, db, order_fields)
 
 
 @router.patch("/api/admin/orders/{order_id}", response_model=OrderResponse)
@@ -164,6 +222,7 @@ def admin_update_order(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    was_sale = counts_as_sale(order.status)
     order.status = data.status
     order.updated_at = datetime.utcnow()
     
@@ -174,4 +233,9 @@ def admin_update_order(
     db.commit()
     db.refresh(order)
     
+    # Отмена/возврат снимает продажи заказа, восстановление — возвращает
+    if counts_as_sale(order.status) != was_sale:
+        record_order_sales(db, order, -1 if was_sale else 1)
+        record_order_co_purchases(order, -1 if was_sale else 1)
+    
     return order
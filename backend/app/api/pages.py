@@ -0,0 +1,166 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel import Session, select, col
+from typing import List
+from app.api.deps import get_db, catalog_sales_conditional_get
+from app.models.category import Category
+from app.models.product import Product
+from app.schemas.page import HomePageResponse, ProductPageResponse
+from app.services.pricing import ensure_effective_prices, get_active_promotions, get_promotion_snapshot
+from app.services.sales import ensure_sales_windows
+from app.services.catalog_index import get_catalog_index, CatalogIndex
+from app.services.categories import get_ancestor_ids
+from app.services.product_cards import load_product_cards
+from app.services.response_cache import cached_json_response
+from app.services.co_purchase import get_co_purchase_index, also_bought_cards
+from app.services.similar import get_similar_index
+
+router = APIRouter(prefix="/api/pages", tags=["pages"])
+
+# Товаров в каждой секции главной страницы
+HOME_SECTION_SIZE = 8
+
+
+@router.get("/home", response_model=HomePageResponse)
+def get_home_page(
+    request: Request,
+    response: Response,
+    version: int = Depends(catalog_sales_conditional_get),
+    db: Session = Depends(get_db)
+):
+    """
+    Главная страница: рекомендуемые, хиты продаж, новинки, со скидкой, категории и акции.
+    Снимок строится один раз на версию каталога (запись в каталог, граница
+    акции или новый порядок хитов продаж меняют версию) и отдаётся готовыми
+    байтами из кэша ответов.
+    """
+    return cached_json_response(
+        "pages.home", request, response, version, HomePageResponse,
+        lambda: _home_page(db),
+    )
+
+
+def _home_page(db: Session) -> dict:
+    ensure_effective_prices(db)
+    ensure_sales_windows(db)
+    index = get_catalog_index(db)
+    
+    sections = {
+        "featured": index.page(index.featured_bits, "newest", HOME_SECTION_SIZE),
+        "bestsellers": index.page(index.all_bits, "popular", HOME_SECTION_SIZE),
+        "new_arrivals": index.page(index.all_bits, "newest", HOME_SECTION_SIZE),
+        "on_sale": index.page(index.on_sale_bits, "newest", HOME_SECTION_SIZE),
+    }
+    
+    # Карточки всех секций — одной загрузкой
+    product_ids = list(dict.fromkeys(pid for rows in sections.values() for pid, _ in rows))
+    cards, _ = load_product_cards(db, product_ids)
+    card_by_id = {card["id"]: card for card in cards}
+    
+    categories = db.exec(
+        select(Category).where(Category.is_active == True).order_by(Category.sort_order)
+    ).all()
+    promotions = sorted(get_active_promotions(db), key=lambda p: p.priority, reverse=True)
+    
+    return {
+        **{
+            name: [card_by_id[pid] for pid, _ in rows if pid in card_by_id]
+            for name, rows in sections.items()
+        },
+        "categories": categories,
+        "promotions": promotions,
+    }
+
+
+@router.get("/product/{slug}", response_model=ProductPageResponse)
+def get_product_page(
+    slug: str,
+    request: Request,
+    response: Response,
+    related: int = Query(6, ge=0, le=24, description="Number of related products"),
+    also_bought: int = Query(6, ge=0, le=24, description="Number of frequently-bought-together products"),
+    version: int = Depends(catalog_sales_conditional_get),
+    db: Session = Depends(get_db)
+):
+    """
+    Страница товара одним ответом: детали, хлебные крошки категорий и похожие
+    товары (индекс похожих по содержимому, затем та же категория, бренд,
+    рекомендуемые и новинки),
+    «с этим товаром покупают» — из индекса совместных покупок.
+    Все цены считаются по одному снимку активных акций.
+    """
+    return cached_json_response(
+        "pages.product", request, response, version, ProductPageResponse,
+        lambda: _product_page(db, slug, related, also_bought),
+    )
+
+
+def _product_page(db: Session, slug: str, related_count: int, also_bought_count: int = 0) -> dict:
+    product_id = db.exec(
+        select(Product.id).where(Product.slug == slug, Product.is_active == True)
+    ).first()
+    if not product_id:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    ensure_effective_prices(db)
+    promotions = get_promotion_snapshot(db)
+    
+    details, _ = load_product_cards(db, [product_id], detail=True, promotions=promotions)
+    product = details[0]
+    
+    breadcrumbs = []
+    if product["category_id"]:
+        ancestor_ids = get_ancestor_ids(db, product["category_id"])
+        categories = db.exec(select(Category).where(col(Category.id).in_(ancestor_ids))).all()
+        by_id = {c.id: c for c in categories}
+        breadcrumbs = [by_id[cid] for cid in ancestor_ids if cid in by_id]
+    
+    related_ids = _related_product_ids(
+        get_catalog_index(db), product, related_count, get_similar_index(db).neighbours(product_id)
+    )
+    related, _ = load_product_cards(db, related_ids, promotions=promotions)
+    
+    also_bought = []
+    if also_bought_count > 0:
+        also_bought = also_bought_cards(
+            db, get_co_purchase_index(db).neighbours(product_id), also_bought_count, promotions=promotions
+        )
+    
+    return {"product": product, "breadcrumbs": breadcrumbs, "related": related, "also_bought": also_bought}
+
+
+def _related_product_ids(index: CatalogIndex, product: dict, limit: int, similar_ids: List[int] = ()) -> List[int]:
+    """
+    Похожие товары по убыванию близости: similar_ids (индекс похожих),
+    затем категория, бренд, рекомендуемые, новинки
+    """
+    if limit <= 0:
+        return []
+    
+    exclude = index.all_bits
+    position = index.position_by_id.get(product["id"])
+    if position is not None:
+        exclude ^= 1 << position
+    
+    result: List[int] = []
+    for product_id in similar_ids:
+        position = index.position_by_id.get(product_id)
+        if position is None or not exclude >> position & 1:
+            continue
+        result.append(product_id)
+        exclude &= ~(1 << position)
+        if len(result) >= limit:
+            return result
+    
+    masks = [index.category_bits.get(product["category_id"], 0) if product["category_id"] else 0]
+    if product["brand"]:
+        masks.append(index.filter(brands=[product["brand"]]))
+    masks += [index.featured_bits, index.all_bits]
+    
+    for mask in masks:
+        mask &= exclude
+        for product_id, _ in index.page(mask, "newest", limit - len(result)):
+            result.append(product_id)
+            exclude &= ~(1 << index.position_by_id[product_id])
+        if len(result) >= limit:
+            break
+    return result
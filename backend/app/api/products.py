@@ -1,160 +1,370 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlmodel import Session, select, col, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel import Session, select, col, func
 from typing import Optional, Literal, List
 from decimal import Decimal
 from math import ceil
-import logging
-from app.api.deps import get_db
+from app.api.deps import get_db, catalog_conditional_get, catalog_sales_conditional_get
 from app.models.product import Product
-from app.models.category import Category
-from app.schemas.product import ProductResponse, ProductListResponse, ProductDetailResponse
-from app.services.pricing import build_product_response, build_product_detail_response
+from app.schemas.product import (
+    ProductResponse, ProductListResponse, ProductDetailResponse, ProductBatchResponse, SuggestionResponse
+)
+from app.services.pricing import ensure_effective_prices
+from app.services.sales import ensure_sales_windows
+from app.services.catalog import listing_query, encode_cursor, build_filters
+from app.services.product_cards import load_product_cards
+from app.services.fieldsets import parse_fields, partial_model, partial_list_model
+from app.services.catalog_index import get_catalog_index
+from app.services.search import build_match_query, search_product_ids, search_rank_subquery
+from app.services.response_cache import cached_json_response
+from app.services.suggest import get_suggest_index
+from app.services.trigrams import fuzzy_product_ids
+from app.services.co_purchase import get_co_purchase_index, also_bought_cards
+from app.services.similar import get_similar_index
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
+# Максимум товаров в /batch
+MAX_BATCH_SIZE = 100
+
 
 @router.get("/", response_model=ProductListResponse)
 def list_products(
     request: Request,
+    response: Response,
     q: Optional[str] = Query(None, description="Search query"),
     min_price: Optional[Decimal] = Query(None),
     max_price: Optional[Decimal] = Query(None),
     in_stock: Optional[bool] = Query(None),
     on_sale: Optional[bool] = Query(None),
-    sort: Literal["price_asc", "price_desc", "newest", "name"] = Query("newest"),
+    sort: Literal["price_asc", "price_desc", "newest", "name", "popular", "trending", "relevance"] = Query(
+        "newest", description="popular / trending — by units sold in the last 30 / 7 days"
+    ),
     page: int = Query(1, ge=1),
     page_size: int = Query(12, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor (next_cursor of the previous page)"),
+    facets: bool = Query(False, description="Include facet counts for the current query"),
+    fields: Optional[str] = Query(None, description="Comma-separated item fields, e.g. id,name,final_price"),
+    version: int = Depends(catalog_conditional_get),
     db: Session = Depends(get_db)
 ):
-    """Список продуктов с фильтрами"""
-    stmt = select(Product).where(Product.is_active == True)
+    """
+    Список продуктов с фильтрами.
+    Пагинация: page (OFFSET, с общим количеством) или cursor (keyset, без total).
+    Ответ кэшируется по параметрам запроса и версии каталога.
+    """
+    item_fields = parse_fields(fields, ProductResponse)
     
-    # Получаем категории напрямую из query параметров (поддержка множественных значений)
+    return cached_json_response(
+        "products.list", request, response, version,
+        partial_list_model(ProductListResponse, ProductResponse, item_fields),
+        lambda: _product_list(
+            db, request, q, min_price, max_price, in_stock, on_sale,
+            sort, page, page_size, cursor, facets, item_fields,
+        ),
+    )
+
+
+def _product_list(
+    db: Session,
+    request: Request,
+    q: Optional[str],
+    min_price: Optional[Decimal],
+    max_price: Optional[Decimal],
+    in_stock: Optional[bool],
+    on_sale: Optional[bool],
+    sort: str,
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    facets: bool,
+    fields: Optional[List[str]] = None,
+) -> dict:
+    """Страница каталога (без кэша)"""
+    # Пересчитать цены, если с прошлого раза началась/закончилась акция
+    ensure_effective_prices(db)
+    ensure_sales_windows(db)
+    index = get_catalog_index(db)
+    
+    # Категории и бренды — из query параметров (поддержка множественных значений)
     category_slugs = request.query_params.getlist("category")
+    brands = request.query_params.getlist("brand")
+    
+    # Полнотекстовый поиск (FTS5)
+    match = build_match_query(q) if q else None
+    
+    # Сортировка по релевантности имеет смысл только с поисковым запросом
+    if sort == "relevance" and not match:
+        sort = "newest"
+    
+    offset = 0 if cursor else (page - 1) * page_size
     
-    # Фильтр по категориям (поддержка множественного выбора)
-    if category_slugs and len(category_slugs) > 0:
-        # Получаем все категории по их slug
-        cats = db.exec(select(Category).where(col(Category.slug).in_(category_slugs))).all()
-        if cats:
-            category_ids = set()
-            selected_cat_ids = {cat.id for cat in cats}
-            
-            # Для каждой выбранной категории
-            for cat in cats:
-                category_ids.add(cat.id)
-                
-                # Если это родительская категория (не дочерняя), добавляем все её дочерние
-                # Проверяем, что это не дочерняя категория (нет родителя среди выбранных)
-                is_parent = not cat.parent_id or cat.parent_id not in selected_cat_ids
-                
-                if is_parent:
-                    # Рекурсивно получаем все дочерние категории
-                    def get_all_children(parent_id):
-                        children = db.exec(select(Category).where(Category.parent_id == parent_id)).all()
-                        for child in children:
-                            category_ids.add(child.id)
-                            get_all_children(child.id)
-                    
-                    get_all_children(cat.id)
-            
-            if len(category_ids) > 0:
-                # Используем .in_() для множественного выбора - это работает как OR
-                stmt = stmt.where(Product.category_id.in_(list(category_ids)))
-    
-    # Поиск
-    if q:
-        search = f"%{q}%"
-        stmt = stmt.where(
-            (col(Product.name).ilike(search)) |
-            (col(Product.brand).ilike(search)) |
-            (col(Product.description).ilike(search))
+    search_ids = search_product_ids(db, match) if match else None
+    fuzzy_scores = None
+    if match and not search_ids:
+        # Точный поиск ничего не нашёл — нечёткий по триграммам (опечатки)
+        fuzzy_scores = fuzzy_product_ids(db, q)
+        search_ids = set(fuzzy_scores)
+    
+    if sort != "relevance" or fuzzy_scores is not None:
+        # In-memory индекс: фильтры — битовые маски, сортировка — готовые перестановки
+        mask = index.filter(
+            category_slugs=category_slugs,
+            brands=brands,
+            in_stock=in_stock,
+            on_sale=on_sale,
+            min_price=min_price,
+            max_price=max_price,
+            product_ids=search_ids,
+        )
+        if sort == "relevance":
+            # Ранг как у bm25: меньше — лучше
+            ranked = sorted((-score, product_id) for product_id, score in fuzzy_scores.items())
+            rows = index.page_ranked(mask, ranked, page_size + 1, offset=offset, cursor=cursor)
+        else:
+            rows = index.page(mask, sort, page_size + 1, offset=offset, cursor=cursor)
+        total = None if cursor else index.count(mask)
+    else:
+        # Релевантность — ранг bm25 есть только в SQLite
+        filters = build_filters(
+            db, category_slugs, brands, None, min_price, max_price, in_stock, on_sale
+        )
+        conditions = [c for group in filters.values() for c in group]
+        stmt = listing_query(
+            conditions, sort,
+            ranked=search_rank_subquery(match),
+            cursor=cursor,
+            with_total=not cursor,
         )
+        result = db.exec(stmt.offset(offset).limit(page_size + 1)).all()
+        rows = [(row[0].id, row.sort_key) for row in result]
+        total = None
+        if not cursor:
+            # COUNT(*) OVER () есть в каждой строке; пустая страница — считаем отдельно
+            total = result[0].total if result else db.exec(
+                select(func.count()).select_from(stmt.order_by(None).subquery())
+            ).one()
     
-    # Фильтр по цене - применяем после получения данных, так как final_price вычисляется динамически
-    # Не применяем фильтр по цене в SQL, будем фильтровать после вычисления final_price
-    
-    # В наличии
-    if in_stock is True:
-        stmt = stmt.where(Product.in_stock == True)
-    
-    # Со скидкой - фильтруем после получения данных, так как нужно проверить и промоакции
-    # Пока получаем все товары, фильтр применим позже
-    
-    # Сортировка
-    if sort == "price_asc":
-        stmt = stmt.order_by(Product.price.asc())
-    elif sort == "price_desc":
-        stmt = stmt.order_by(Product.price.desc())
-    elif sort == "name":
-        stmt = stmt.order_by(Product.name.asc())
-    else:  # newest
-        stmt = stmt.order_by(Product.created_at.desc())
-    
-    # Получаем минимальную и максимальную цены всех активных товаров (без фильтров)
-    all_active_products = db.exec(select(Product).where(Product.is_active == True)).all()
-    min_price_db = None
-    max_price_db = None
-    if all_active_products:
-        prices = [float(p.price) for p in all_active_products if p.price]
-        if prices:
-            min_price_db = Decimal(str(min(prices)))
-            max_price_db = Decimal(str(max(prices)))
-    
-    # Получаем все товары после применения фильтров (кроме цены)
-    all_filtered = db.exec(stmt).all()
-    
-    # Фильтруем по финальной цене и скидке (если заданы фильтры)
-    if min_price is not None or max_price is not None or on_sale is True:
-        from app.services.pricing import apply_promotions
-        filtered_products = []
-        for p in all_filtered:
-            final_price, discount_percent = apply_promotions(p, db)
-            
-            # Фильтр по цене
-            if min_price is not None and final_price < min_price:
-                continue
-            if max_price is not None and final_price > max_price:
-                continue
-            
-            # Фильтр "со скидкой" - проверяем old_price или наличие промоакции
-            if on_sale is True:
-                has_discount = (p.old_price is not None and p.old_price > p.price) or discount_percent is not None
-                if not has_discount:
-                    continue
-            
-            filtered_products.append(p)
-        all_filtered = filtered_products
-    
-    total = len(all_filtered)
-    
-    # Пагинация
-    offset = (page - 1) * page_size
-    products = all_filtered[offset:offset + page_size]
+    # Лишняя запись означает, что есть следующая страница
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(sort, rows[-1][1], rows[-1][0])
     
     # Формируем ответ
-    items = [build_product_response(p, db) for p in products]
+    items, _ = load_product_cards(db, [product_id for product_id, _ in rows], fields=fields)
+    
+    # Фасеты для сайдбара — один проход по in-memory индексу с теми же фильтрами
+    product_facets = None
+    if facets:
+        product_facets = index.facets(
+            category_slugs=category_slugs,
+            brands=brands,
+            in_stock=in_stock,
+            on_sale=on_sale,
+            min_price=min_price,
+            max_price=max_price,
+            product_ids=search_ids,
+        )
     
-    return ProductListResponse(
+    return dict(
         items=items,
         total=total,
         page=page,
         page_size=page_size,
-        pages=ceil(total / page_size) if total > 0 else 1,
-        min_price=min_price_db,
-        max_price=max_price_db
+        pages=(ceil(total / page_size) if total > 0 else 1) if total is not None else None,
+        next_cursor=next_cursor,
+        facets=product_facets,
+        fuzzy=fuzzy_scores is not None,
+        # Минимальная и максимальная базовые цены всех активных товаров (без фильтров)
+        min_price=index.min_base_price,
+        max_price=index.max_base_price
+    )
+
+
+@router.get("/suggest", response_model=List[SuggestionResponse])
+def suggest_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    """Подсказки для строки поиска (in-memory префиксный индекс, без запросов к БД)"""
+    return get_suggest_index(db).suggest(q, limit)
+
+
+@router.get("/batch", response_model=ProductBatchResponse)
+def get_products_batch(
+    request: Request,
+    response: Response,
+    version: int = Depends(catalog_conditional_get),
+    db: Session = Depends(get_db)
+):
+    """
+    Карточки нескольких товаров за один запрос (корзина, избранное).
+    ids и slugs — повторяющиеся параметры или через запятую: ?ids=1,2&slugs=a&slugs=b.
+    Порядок ответа — порядок запроса (сначала ids, затем slugs).
+    """
+    product_ids = _id_list_param(request, "ids")
+    slugs = _list_param(request, "slugs")
+    
+    if len(product_ids) + len(slugs) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} products per request")
+    
+    return cached_json_response(
+        "products.batch", request, response, version, ProductBatchResponse,
+        lambda: _product_batch(db, product_ids, slugs),
+    )
+
+
+def _list_param(request: Request, name: str) -> List[str]:
+    """Значения параметра без повторов: ?name=a&name=b или ?name=a,b"""
+    values = []
+    for raw in request.query_params.getlist(name):
+        for value in raw.split(","):
+            value = value.strip()
+            if value and value not in values:
+                values.append(value)
+    return values
+
+
+def _id_list_param(request: Request, name: str) -> List[int]:
+    """Список id из параметра (см. _list_param); нечисловое значение — 400"""
+    product_ids = []
+    for value in _list_param(request, name):
+        try:
+            product_ids.append(int(value))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid product id: {value}")
+    return product_ids
+
+
+def _product_batch(db: Session, product_ids: List[int], slugs: List[str]) -> dict:
+    # slug -> id одним запросом, только активные товары
+    id_by_slug = {}
+    if slugs:
+        id_by_slug = dict(db.exec(
+            select(Product.slug, Product.id).where(col(Product.slug).in_(slugs), Product.is_active == True)
+        ).all())
+    
+    requested = list(product_ids)
+    for slug in slugs:
+        product_id = id_by_slug.get(slug)
+        if product_id is not None and product_id not in requested:
+            requested.append(product_id)
+    
+    items, _ = load_product_cards(db, requested, active_only=True)
+    found = {item["id"] for item in items}
+    
+    return {
+        "items": items,
+        "missing_ids": [pid for pid in product_ids if pid not in found],
+        "missing_slugs": [slug for slug in slugs if slug not in id_by_slug],
+    }
+
+
+@router.get("/also-bought", response_model=List[ProductResponse])
+def get_basket_also_bought(
+    request: Request,
+    response: Response,
+    limit: int = Query(8, ge=1, le=24),
+    version: int = Depends(catalog_sales_conditional_get),
+    db: Session = Depends(get_db)
+):
+    """
+    «С этими товарами покупают» для корзины: ids — товары корзины
+    (?ids=1,2,3). Соседи из индекса совместных покупок, без товаров корзины.
+    """
+    product_ids = _id_list_param(request, "ids")
+    if len(product_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} products per request")
+    
+    return cached_json_response(
+        "products.basket_also_bought", request, response, version, List[ProductResponse],
+        lambda: also_bought_cards(db, get_co_purchase_index(db).for_basket(product_ids), limit),
     )
 
 
 @router.get("/{slug}", response_model=ProductDetailResponse)
-def get_product(slug: str, db: Session = Depends(get_db)):
+def get_product(
+    slug: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,name,final_price"),
+    version: int = Depends(catalog_conditional_get),
+    db: Session = Depends(get_db)
+):
     """Получить продукт по slug"""
-    product = db.exec(
-        select(Product).where(Product.slug == slug, Product.is_active == True)
+    detail_fields = parse_fields(fields, ProductDetailResponse)
+    
+    return cached_json_response(
+        "products.detail", request, response, version,
+        partial_model(ProductDetailResponse, detail_fields),
+        lambda: _product_detail(db, slug, detail_fields),
+    )
+
+
+def _product_detail(db: Session, slug: str, fields: Optional[List[str]] = None) -> dict:
+    product_id = db.exec(
+        select(Product.id).where(Product.slug == slug, Product.is_active == True)
+    ).first()
+    
+    if not product_id:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    items, _ = load_product_cards(db, [product_id], detail=True, fields=fields)
+    return items[0]
+
+
+@router.get("/{slug}/also-bought", response_model=List[ProductResponse])
+def get_also_bought(
+    slug: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(8, ge=1, le=24),
+    version: int = Depends(catalog_sales_conditional_get),
+    db: Session = Depends(get_db)
+):
+    """«С этим товаром покупают»: соседи товара в индексе совместных покупок"""
+    return cached_json_response(
+        "products.also_bought", request, response, version, List[ProductResponse],
+        lambda: _also_bought(db, slug, limit),
+    )
+
+
+def _also_bought(db: Session, slug: str, limit: int) -> List[dict]:
+    product_id = db.exec(
+        select(Product.id).where(Product.slug == slug, Product.is_active == True)
     ).first()
     
-    if not product:
+    if not product_id:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    return build_product_detail_response(product, db)
+    return also_bought_cards(db, get_co_purchase_index(db).neighbours(product_id), limit)
+
+
+@router.get("/{slug}/similar", response_model=List[ProductResponse])
+def get_similar_products(
+    slug: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(8, ge=1, le=20),
+    version: int = Depends(catalog_conditional_get),
+    db: Session = Depends(get_db)
+):
+    """Похожие по содержимому товары: категория, бренд, цена, слова названия и описания"""
+    return cached_json_response(
+        "products.similar", request, response, version, List[ProductResponse],
+        lambda: _similar(db, slug, limit),
+    )
+
 
+def _similar(db: Session, slug: str, limit: int) -> List[dict]:
+    product_id = db.exec(
+        select(Product.id).where(Product.slug == slug, Product.is_active == True)
+    ).first()
+    
+    if not product_id:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    similar_ids = get_similar_index(db).neighbours(product_id)[:limit]
+    items, _ = load_product_cards(db, similar_ids, active_only=True)
+    return items
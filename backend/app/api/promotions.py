@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select
 from typing import List
 from datetime import datetime
-from app.api.deps import get_db, admin_required
+from app.api.deps import get_db, admin_required, catalog_conditional_get
 from app.models.user import User
 from app.models.promotion import Promotion
-from app.schemas.promotion import PromotionResponse, PromotionCreate, PromotionUpdate
+from app.schemas.promotion import PromotionResponse, PromotionCreate, PromotionUpdate, PromotionSimulationResponse
+from app.services.catalog import refresh_catalog
+from app.services.promotion_simulator import simulate_promotion
+from app.services.promotion_targets import set_promotion_targets, delete_promotion_targets
+from app.services.response_cache import cached_json_response
 
 router = APIRouter(prefix="/api/promotions", tags=["promotions"])
 
@@ -13,7 +17,12 @@ router = APIRouter(prefix="/api/promotions", tags=["promotions"])
 # === Public ===
 
 @router.get("/active", response_model=List[PromotionResponse])
-def list_active_promotions(db: Session = Depends(get_db)):
+def list_active_promotions(
+    request: Request,
+    response: Response,
+    version: int = Depends(catalog_conditional_get),
+    db: Session = Depends(get_db)
+):
     """Список активных акций (публичный)"""
     now = datetime.utcnow()
     
@@ -23,7 +32,10 @@ def list_active_promotions(db: Session = Depends(get_db)):
         (Promotion.ends_at == None) | (Promotion.ends_at >= now),
     ).order_by(Promotion.priority.desc())
     
-    return db.exec(stmt).all()
+    return cached_json_response(
+        "promotions.active", request, response, version, List[PromotionResponse],
+        lambda: db.exec(stmt).all(),
+    )
 
 
 # === Admin CRUD ===
@@ -40,6 +52,21 @@ def list_promotions(
     return db.exec(stmt).all()
 
 
+@router.post("/simulate", response_model=PromotionSimulationResponse)
+def simulate_draft_promotion(
+    data: PromotionCreate,
+    limit: int = Query(100, ge=0, le=1000),
+    db: Session = Depends(get_db),
+    _: User = Depends(admin_required)
+):
+    """
+    Оценить черновик акции на активном каталоге, ничего не сохраняя (админ):
+    какие товары он затронет, как изменятся цены и выручка, какие акции
+    он вытеснит и какие перекроют его. limit — сколько товаров вернуть.
+    """
+    return simulate_promotion(db, Promotion(**data.model_dump()), limit)
+
+
 @router.get("/{promotion_id}", response_model=PromotionResponse)
 def get_promotion(
     promotion_id: int,
@@ -68,8 +95,11 @@ def create_promotion(
     
     promo = Promotion(**data.model_dump())
     db.add(promo)
+    db.flush()
+    set_promotion_targets(db, promo)
     db.commit()
     db.refresh(promo)
+    refresh_catalog(db)
     return promo
 
 
@@ -102,8 +132,11 @@ def update_promotion(
         setattr(promo, key, value)
     
     db.add(promo)
+    if "scope" in update_data or "target_ids" in update_data:
+        set_promotion_targets(db, promo)
     db.commit()
     db.refresh(promo)
+    refresh_catalog(db)
     return promo
 
 
@@ -118,8 +151,10 @@ def delete_promotion(
     if not promo:
         raise HTTPException(status_code=404, detail="Promotion not found")
     
+    delete_promotion_targets(db, promotion_id)
     db.delete(promo)
     db.commit()
+    refresh_catalog(db)
     return {"message": "Promotion deleted"}
 
 
@@ -19,6 +19,15 @@ class Settings(BaseSettings):
     ADMIN_PHONE: Optional[str] = "+380000000000"
     ADMIN_PASSWORD: Optional[str] = None
     
+    # Кэш ответов публичного каталога
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_TTL_SECONDS: float = 300
+    
+    # Схлопывание одинаковых параллельных запросов каталога
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_TIMEOUT_SECONDS: float = 10
+    
     # Nova Poshta API (for frontend)
     NOVA_POSHTA_API_KEY: Optional[str] = None
     
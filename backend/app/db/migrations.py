@@ -0,0 +1,67 @@
+"""Лёгкие миграции схемы без Alembic: новые колонки и пересчёт производных данных."""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel, Session
+
+
+def add_missing_columns(engine: Engine) -> list:
+    """Добавить в существующие таблицы колонки, объявленные в моделях"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+                # Заполняем значением по умолчанию из модели (если оно скалярное)
+                default = column.default.arg if column.default is not None else None
+                if default is not None and not callable(default):
+                    conn.execute(
+                        text(f'UPDATE {table.name} SET "{column.name}" = :value'),
+                        {"value": default},
+                    )
+
+                added.append(f"{table.name}.{column.name}")
+
+    # Индексы на новых колонках (create_all создаёт их только для новых таблиц)
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    return added
+
+
+def run_migrations(engine: Engine) -> None:
+    """Привести схему и производные данные к актуальному состоянию"""
+    added = add_missing_columns(engine)
+    for name in added:
+        print(f"Added column {name}")
+
+    # Импорт здесь, чтобы миграции не тянули сервисы при импорте модуля
+    from app.services.catalog import refresh_catalog
+    from app.services.categories import rebuild_category_closure
+    from app.services.search import create_search_index, rebuild_search_index
+    from app.services.sales import rebuild_sales_counters
+    from app.services.promotion_targets import backfill_promotion_targets
+
+    create_search_index(engine)
+
+    with Session(engine) as session:
+        rebuild_category_closure(session)
+        # Цели акций — до пересчёта цен (снимок акций читает их из таблицы)
+        filled = backfill_promotion_targets(session)
+        if filled:
+            print(f"Backfilled targets of {filled} promotions")
+        refresh_catalog(session)
+        rebuild_search_index(session)
+        rebuild_sales_counters(session)
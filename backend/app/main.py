@@ -29,8 +29,11 @@ from app.api import (
     favorites,
     admin_categories,
     admin_products,
-    admin_stats
+    admin_stats,
+    pages
 )
+from app.db.session import engine
+from app.services.similar import start_similar_index_build
 
 # Routers - all already have /api prefix
 app.include_router(auth.router)
@@ -43,6 +46,7 @@ app.include_router(favorites.router)
 app.include_router(admin_categories.router)
 app.include_router(admin_products.router)
 app.include_router(admin_stats.router)
+app.include_router(pages.router)
 
 # Static files for uploads
 # Create directory if it doesn't exist
@@ -50,6 +54,12 @@ os.makedirs("/data/uploads", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="/data/uploads"), name="uploads")
 
 
+@app.on_event("startup")
+def start_background_indexes():
+    # Индекс похожих товаров строится в фоне, а не на первом запросе
+    start_similar_index_build(engine)
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "service": "spongik-api"}
@@ -1,15 +1,15 @@
 from .user import User, UserRole
-from .category import Category
-from .product import Product, ProductImage
-from .promotion import Promotion, PromotionType, PromotionScope
+from .category import Category, CategoryClosure
+from .product import Product, ProductImage, ProductSales
+from .promotion import Promotion, PromotionType, PromotionScope, PromotionTarget
 from .favorite import Favorite
 from .order import Order, OrderItem, OrderStatus, DeliveryType, PaymentType
 
 __all__ = [
     "User", "UserRole",
-    "Category",
-    "Product", "ProductImage",
-    "Promotion", "PromotionType", "PromotionScope",
+    "Category", "CategoryClosure",
+    "Product", "ProductImage", "ProductSales",
+    "Promotion", "PromotionType", "PromotionScope", "PromotionTarget",
     "Favorite",
     "Order", "OrderItem", "OrderStatus", "DeliveryType", "PaymentType",
 ]
@@ -30,3 +30,15 @@ class Category(SQLModel, table=True):
 
 
 
+
+
+class CategoryClosure(SQLModel, table=True):
+    """
+    Таблица замыкания дерева категорий: пара (предок, потомок) для каждого пути,
+    включая саму категорию (depth = 0). Поддерживается services/categories.
+    """
+    __tablename__ = "category_closure"
+    
+    ancestor_id: int = Field(foreign_key="categories.id", primary_key=True)
+    descendant_id: int = Field(foreign_key="categories.id", primary_key=True, index=True)
+    depth: int = Field(default=0)
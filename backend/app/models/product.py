@@ -1,6 +1,7 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List, TYPE_CHECKING
-from datetime import datetime
+from datetime import datetime, date
 from decimal import Decimal
 
 if TYPE_CHECKING:
@@ -11,6 +12,14 @@ if TYPE_CHECKING:
 
 class Product(SQLModel, table=True):
     __tablename__ = "products"
+    __table_args__ = (
+        # Индексы под сортировки каталога и keyset-пагинацию (ключ, id)
+        Index("ix_products_active_created_id", "is_active", "created_at", "id"),
+        Index("ix_products_active_name_id", "is_active", "name", "id"),
+        Index("ix_products_active_final_price_id", "is_active", "final_price", "id"),
+        Index("ix_products_active_sales_30d_id", "is_active", "sales_30d", "id"),
+        Index("ix_products_active_sales_7d_id", "is_active", "sales_7d", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
@@ -29,6 +38,18 @@ class Product(SQLModel, table=True):
     is_active: bool = Field(default=True)
     is_featured: bool = Field(default=False)
     
+    # Эффективная цена с учётом old_price и акций.
+    # Материализуется в services/pricing.refresh_effective_prices,
+    # чтобы фильтры/сортировка каталога работали в SQL
+    final_price: Optional[Decimal] = Field(default=None, max_digits=10, decimal_places=2, index=True)
+    discount_percent: Optional[int] = None
+    is_on_sale: bool = Field(default=False, index=True)
+    
+    # Продано штук за последние 7 / 30 дней (без отменённых и возвращённых заказов).
+    # Материализуется в services/sales из дневных счётчиков ProductSales
+    sales_7d: int = Field(default=0)
+    sales_30d: int = Field(default=0)
+    
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -52,3 +73,12 @@ class ProductImage(SQLModel, table=True):
     # Relationships
     product: Optional["Product"] = Relationship(back_populates="images")
 
+
+
+class ProductSales(SQLModel, table=True):
+    """Продано штук товара за день (по дате создания заказа)"""
+    __tablename__ = "product_sales"
+    
+    product_id: int = Field(foreign_key="products.id", primary_key=True)
+    day: date = Field(primary_key=True, index=True)
+    quantity: int = Field(default=0)
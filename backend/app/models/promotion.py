@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
@@ -31,7 +32,8 @@ class Promotion(SQLModel, table=True):
     # Значение скидки (процент или фикс. сумма)
     value: Decimal = Field(max_digits=10, decimal_places=2)
     
-    # Привязка к категории/продукту (JSON array of ids)
+    # Привязка к категории/продукту (JSON array of ids). Нормализованная
+    # копия для запросов — PromotionTarget (services/promotion_targets)
     target_ids: Optional[str] = None
     
     starts_at: Optional[datetime] = None
@@ -40,3 +42,15 @@ class Promotion(SQLModel, table=True):
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+
+class PromotionTarget(SQLModel, table=True):
+    """Категория или товар, к которым привязана акция (scope category/product)"""
+    __tablename__ = "promotion_targets"
+    __table_args__ = (
+        # «Какие акции действуют на эти товары/категории» — поиск по (тип, id)
+        Index("ix_promotion_targets_target", "target_type", "target_id", "promotion_id"),
+    )
+    
+    promotion_id: int = Field(foreign_key="promotions.id", primary_key=True)
+    target_type: PromotionScope = Field(primary_key=True)
+    target_id: int = Field(primary_key=True)
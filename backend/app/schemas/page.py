@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from typing import List
+from app.schemas.product import ProductResponse, ProductDetailResponse
+from app.schemas.category import CategoryResponse
+from app.schemas.promotion import PromotionResponse
+
+
+class HomePageResponse(BaseModel):
+    """Все данные главной страницы одним ответом"""
+    featured: List[ProductResponse] = []
+    bestsellers: List[ProductResponse] = []
+    new_arrivals: List[ProductResponse] = []
+    on_sale: List[ProductResponse] = []
+    categories: List[CategoryResponse] = []
+    promotions: List[PromotionResponse] = []
+
+
+class BreadcrumbItem(BaseModel):
+    id: int
+    name: str
+    slug: str
+
+    class Config:
+        from_attributes = True
+
+
+class ProductPageResponse(BaseModel):
+    """Страница товара: детали, цепочка категорий и похожие товары"""
+    product: ProductDetailResponse
+    breadcrumbs: List[BreadcrumbItem] = []
+    related: List[ProductResponse] = []
+    also_bought: List[ProductResponse] = []
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Literal
 from decimal import Decimal
 
 
@@ -51,9 +51,50 @@ class ProductDetailResponse(ProductResponse):
         from_attributes = True
 
 
+class CategoryFacet(BaseModel):
+    category_id: int
+    count: int
+
+
+class BrandFacet(BaseModel):
+    brand: str
+    count: int
+
+
+class PriceBucket(BaseModel):
+    min: Decimal
+    max: Decimal
+    count: int
+
+
+class ProductFacets(BaseModel):
+    """Фасеты каталога: каждый считается без собственного фильтра"""
+    categories: List[CategoryFacet] = []
+    brands: List[BrandFacet] = []
+    in_stock: int = 0
+    on_sale: int = 0
+    price_min: Optional[Decimal] = None
+    price_max: Optional[Decimal] = None
+    price_histogram: List[PriceBucket] = []
+
+
 class ProductListResponse(BaseModel):
     """Пагинированный список"""
     items: List[ProductResponse]
+    total: Optional[int] = None  # None в режиме cursor
+    page: int
+    page_size: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    facets: Optional[ProductFacets] = None
+    fuzzy: bool = False  # результаты нечёткого поиска (точный ничего не нашёл)
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+
+
+class AdminProductListResponse(BaseModel):
+    """Пагинированный список товаров в админке (без курсора, фасетов и нечёткого поиска)"""
+    items: List[ProductResponse]
     total: int
     page: int
     page_size: int
@@ -119,3 +160,20 @@ class BulkActiveUpdate(BaseModel):
 
 class BulkStockUpdate(BaseModel):
     updates: List[dict]  # [{product_id, stock_qty}]
+
+
+class ProductBatchResponse(BaseModel):
+    """Несколько карточек по id/slug в порядке запроса"""
+    items: List[ProductResponse]
+    missing_ids: List[int] = []
+    missing_slugs: List[str] = []
+
+
+class SuggestionResponse(BaseModel):
+    """Подсказка поиска: товар, бренд или категория"""
+    type: Literal["product", "brand", "category"]
+    label: str
+    id: Optional[int] = None
+    slug: Optional[str] = None
+    brand: Optional[str] = None
+    final_price: Optional[Decimal] = None
@@ -51,8 +51,33 @@ class PromotionUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class SimulatedProductResponse(BaseModel):
+    id: int
+    name: str
+    slug: str
+    price: Decimal
+    current_price: Decimal
+    simulated_price: Decimal
+    price_delta: Decimal
+    current_promotion_id: Optional[int] = None
+    sales_30d: int
 
 
+class PromotionInteraction(BaseModel):
+    id: int
+    code: Optional[str] = None
+    name: str
+    products: int
 
 
-
+class PromotionSimulationResponse(BaseModel):
+    catalog_size: int
+    targeted: int  # товары в scope/целях черновика
+    applied: int  # черновик стал лучшей акцией
+    affected: int  # цена изменилась
+    blocked_by_old_price: int
+    total_price_delta: Decimal
+    revenue_delta_30d: Decimal  # оценка: изменение цены × продажи за 30 дней
+    shadowed_promotions: List[PromotionInteraction]  # действующие акции, которые черновик вытеснит
+    blocking_promotions: List[PromotionInteraction]  # действующие акции, которые перекроют черновик
+    products: List[SimulatedProductResponse]
@@ -4,6 +4,7 @@ Seed-скрипт: создание админа из ENV если не суще
 """
 from sqlmodel import SQLModel, Session, select
 from app.db.session import engine
+from app.db.migrations import run_migrations
 from app.models.user import User, UserRole
 from app.core.security import hash_password
 from app.core.config import settings
@@ -52,6 +53,8 @@ def seed_admin():
 def main():
     print("Creating tables...")
     create_tables()
+    print("Running migrations...")
+    run_migrations(engine)
     print("Seeding admin...")
     seed_admin()
     print("Done!")
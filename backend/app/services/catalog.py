@@ -0,0 +1,179 @@
+from typing import Optional, Iterable, List
+from decimal import Decimal
+from sqlalchemy import tuple_
+from sqlmodel import Session, select, col, func
+from app.models.product import Product
+from app.services.pricing import refresh_effective_prices, invalidate_promotion_snapshot
+from app.services.search import index_products, search_condition
+from app.services.categories import get_subtree_ids_by_slugs
+from app.services.catalog_index import patch_catalog_index, invalidate_catalog_index
+from app.services.cursors import encode_cursor, decode_cursor
+from app.services.catalog_version import bump_catalog_version
+from app.services.suggest import patch_suggest_index, invalidate_suggest_index
+from app.services.trigrams import patch_trigram_index
+from app.services.similar import patch_similar_index
+
+
+# Режим сортировки -> (колонка, направление). id добавляется вторым ключом,
+# чтобы порядок был строгим и по нему можно было продолжать выборку (keyset)
+SORT_COLUMNS = {
+    "newest": (Product.created_at, "desc"),
+    "name": (Product.name, "asc"),
+    "price_asc": (Product.final_price, "asc"),
+    "price_desc": (Product.final_price, "desc"),
+    "popular": (Product.sales_30d, "desc"),
+    "trending": (Product.sales_7d, "desc"),
+}
+
+
+def refresh_catalog(db: Session, product_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Обновить производные данные каталога после записи.
+    Вызывается из админских роутов после commit:
+    product_ids — для изменённых товаров, None — для всего каталога
+    (например, после изменения акций).
+    """
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+
+    if product_ids is None:
+        # Полный пересчёт — после записи акций: снимок акций устарел
+        invalidate_promotion_snapshot()
+    refresh_effective_prices(db, product_ids)
+    bump_catalog_version()
+    
+    if product_ids is None:
+        invalidate_catalog_index()
+        invalidate_suggest_index()
+        # Индекс похожих от цен и акций не зависит — не сбрасывается
+    else:
+        patch_catalog_index(db, product_ids)
+        patch_suggest_index(db, product_ids)
+        patch_trigram_index(db, product_ids)
+        patch_similar_index(db, product_ids)
+
+
+def refresh_products(db: Session, product_ids: Iterable[int]) -> None:
+    """
+    Товары созданы, изменены или удалены: пересчитать их цены
+    и обновить поисковый индекс.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    
+    refresh_catalog(db, product_ids)
+    index_products(db, product_ids)
+
+
+def refresh_categories(db: Session, category_id: int) -> None:
+    """
+    Категория создана, изменена или удалена: цены её товаров и дерево.
+    Дерево (поддеревья в индексе каталога, категории в подсказках) патчами
+    не обновляется, поэтому индексы сбрасываются целиком — без
+    патчей товаров, с одним увеличением версии каталога.
+    """
+    product_ids = db.exec(select(Product.id).where(Product.category_id == category_id)).all()
+    if product_ids:
+        refresh_effective_prices(db, product_ids)
+    invalidate_catalog_index()
+    invalidate_suggest_index()
+    bump_catalog_version()
+
+
+def refresh_product_images(db: Session, product_id: int) -> None:
+    """Изображения товара изменены: цены и индекс не затронуты, меняется только ответ API"""
+    bump_catalog_version()
+
+
+# === Фильтры ===
+
+def build_filters(
+    db: Session,
+    category_slugs: Optional[List[str]] = None,
+    brands: Optional[List[str]] = None,
+    match: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    in_stock: Optional[bool] = None,
+    on_sale: Optional[bool] = None,
+    search_ids: Optional[Iterable[int]] = None,
+) -> dict:
+    """
+    SQL-условия публичного каталога по группам (SQL-путь листинга;
+    фасеты считает CatalogIndex.facets). match — строка FTS-запроса (search.build_match_query),
+    search_ids — найденные нечётким поиском товары (вместо match).
+    """
+    filters = {"active": [Product.is_active == True]}
+    
+    # Выбранные категории и все их потомки — одним запросом по таблице замыкания
+    if category_slugs:
+        category_ids = get_subtree_ids_by_slugs(db, category_slugs)
+        if category_ids:
+            filters["category"] = [col(Product.category_id).in_(list(category_ids))]
+    
+    if brands:
+        filters["brand"] = [col(Product.brand).in_(brands)]
+    
+    if match:
+        filters["search"] = [search_condition(match)]
+    elif search_ids is not None:
+        filters["search"] = [col(Product.id).in_(list(search_ids))]
+    
+    # Фильтр по финальной цене (материализована в Product.final_price)
+    price_conditions = []
+    if min_price is not None:
+        price_conditions.append(Product.final_price >= min_price)
+    if max_price is not None:
+        price_conditions.append(Product.final_price <= max_price)
+    if price_conditions:
+        filters["price"] = price_conditions
+    
+    if in_stock is True:
+        filters["in_stock"] = [Product.in_stock == True]
+    
+    # Со скидкой — old_price или действующая промоакция
+    if on_sale is True:
+        filters["on_sale"] = [Product.is_on_sale == True]
+    
+    return filters
+
+
+# === Сортировка и keyset-пагинация ===
+
+def sort_column(sort: str, ranked=None):
+    """(колонка, направление) для режима sort; relevance — по rank из FTS"""
+    if sort == "relevance":
+        return ranked.c.rank, "asc"
+    return SORT_COLUMNS[sort]
+
+
+def listing_query(conditions: list, sort: str, ranked=None, cursor: Optional[str] = None, with_total: bool = False):
+    """
+    SELECT для страницы каталога: (Product, sort_key[, total]) с ORDER BY (ключ, id).
+    ranked — подзапрос релевантности (search.search_rank_subquery) для sort=relevance,
+    cursor — продолжить после позиции курсора, with_total — добавить COUNT(*) OVER ().
+    """
+    column, direction = sort_column(sort, ranked)
+    
+    columns = [Product, column.label("sort_key")]
+    if with_total:
+        columns.append(func.count().over().label("total"))
+    
+    stmt = select(*columns).where(*conditions)
+    if ranked is not None:
+        stmt = stmt.join(ranked, ranked.c.product_id == Product.id)
+    
+    if cursor:
+        # Сравнение кортежей (ключ, id) — диапазон по индексу
+        value, product_id = decode_cursor(cursor, sort)
+        if direction == "desc":
+            stmt = stmt.where(tuple_(column, Product.id) < tuple_(value, product_id))
+        else:
+            stmt = stmt.where(tuple_(column, Product.id) > tuple_(value, product_id))
+    
+    if direction == "desc":
+        return stmt.order_by(column.desc(), Product.id.desc())
+    return stmt.order_by(column.asc(), Product.id.asc())
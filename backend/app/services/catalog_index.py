@@ -0,0 +1,582 @@
+"""Колоночный in-memory индекс активных товаров: фильтры — битовые маски, сортировки — готовые перестановки."""
+from array import array
+from bisect import bisect_right, bisect_left
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+from typing import Optional, Iterable, List, Tuple, Dict
+import copy
+import threading
+from sqlmodel import Session, select, col
+from app.models.product import Product
+from app.models.category import Category, CategoryClosure
+from app.services import pricing
+from app.services.price_kernel import to_kopecks, from_kopecks
+from app.services.cursors import decode_cursor
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Количество корзин гистограммы цен в фасетах
+PRICE_HISTOGRAM_BUCKETS = 10
+
+
+def _to_kopecks(value: Optional[Decimal]) -> int:
+    return to_kopecks(value) if value is not None else 0
+
+
+def _to_micros(value: datetime) -> int:
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def _price_histogram(prices: List[int], price_min: Optional[Decimal], price_max: Optional[Decimal]) -> list:
+    """Гистограмма цен (в копейках) с целой шириной корзины в рублях"""
+    if price_min is None or price_max is None:
+        return []
+
+    low = price_min.to_integral_value(rounding=ROUND_FLOOR)
+    width = ((price_max - low) / PRICE_HISTOGRAM_BUCKETS).to_integral_value(rounding=ROUND_CEILING)
+    width = max(width, Decimal("1"))
+
+    low_kopecks = int(low) * 100
+    width_kopecks = int(width) * 100
+    counts = [0] * PRICE_HISTOGRAM_BUCKETS
+    for price in prices:
+        # Максимальная цена попадает на правую границу — в последнюю корзину
+        counts[min((price - low_kopecks) // width_kopecks, PRICE_HISTOGRAM_BUCKETS - 1)] += 1
+
+    return [
+        {"min": low + width * i, "max": low + width * (i + 1), "count": count}
+        for i, count in enumerate(counts)
+    ]
+
+
+def _bits(positions: Iterable[int], size: int) -> int:
+    """Битовая маска из позиций (через bytearray — линейно по размеру)"""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class CatalogIndex:
+    """Снимок активного каталога. После построения не изменяется, кроме patch_flags"""
+
+    def __init__(
+        self,
+        products: List[Product],
+        category_subtrees: dict,
+        valid_until: datetime,
+        category_ancestors: Optional[dict] = None,
+    ):
+        self.built_at = datetime.utcnow()
+        self.valid_until = valid_until
+        # slug -> id категории и всех потомков; id -> id самой категории и всех предков
+        self.category_subtrees = category_subtrees
+        self.category_ancestors = category_ancestors or {}
+        self.size = len(products)
+
+        self.ids = array("q", (p.id for p in products))
+        self.category_ids = array("q", (p.category_id or 0 for p in products))
+        self.final_prices = array("q", (
+            _to_kopecks(p.final_price if p.final_price is not None else p.price) for p in products
+        ))
+        self.created_at = array("q", (_to_micros(p.created_at) for p in products))
+        self.in_stock = bytearray(1 if p.in_stock else 0 for p in products)
+        self.featured = bytearray(1 if p.is_featured else 0 for p in products)
+        self.on_sale = bytearray(1 if p.is_on_sale else 0 for p in products)
+        self.names = [p.name for p in products]
+        self.sales_7d = array("q", (p.sales_7d or 0 for p in products))
+        self.sales_30d = array("q", (p.sales_30d or 0 for p in products))
+
+        self.brands = sorted({p.brand for p in products if p.brand})
+        brand_code = {brand: code for code, brand in enumerate(self.brands, start=1)}
+        self.brand_codes = array("l", (brand_code.get(p.brand, 0) for p in products))
+
+        self.position_by_id = {product_id: pos for pos, product_id in enumerate(self.ids)}
+
+        base_prices = [p.price for p in products if p.price is not None]
+        self.min_base_price = min(base_prices) if base_prices else None
+        self.max_base_price = max(base_prices) if base_prices else None
+
+        # Битовые маски: бит i — товар в позиции i
+        self.all_bits = (1 << self.size) - 1
+        self.in_stock_bits = _bits((i for i, flag in enumerate(self.in_stock) if flag), self.size)
+        self.on_sale_bits = _bits((i for i, flag in enumerate(self.on_sale) if flag), self.size)
+        self.featured_bits = _bits((i for i, flag in enumerate(self.featured) if flag), self.size)
+
+        positions_by_category = {}
+        for pos, category_id in enumerate(self.category_ids):
+            positions_by_category.setdefault(category_id, []).append(pos)
+        self.category_bits = {cid: _bits(positions, self.size) for cid, positions in positions_by_category.items()}
+
+        positions_by_brand = {}
+        for pos, code in enumerate(self.brand_codes):
+            positions_by_brand.setdefault(code, []).append(pos)
+        self.brand_bits = {code: _bits(positions, self.size) for code, positions in positions_by_brand.items()}
+
+        # Перестановки позиций для каждого режима сортировки; ключи — по возрастанию,
+        # убывающие сортировки хранятся с отрицанием (чтобы искать курсор через bisect)
+        self.order_keys = {
+            "newest": sorted((-self.created_at[i], -self.ids[i], i) for i in range(self.size)),
+            "name": sorted((self.names[i], self.ids[i], i) for i in range(self.size)),
+            "price_asc": sorted((self.final_prices[i], self.ids[i], i) for i in range(self.size)),
+            "price_desc": sorted((-self.final_prices[i], -self.ids[i], i) for i in range(self.size)),
+        }
+        self.orders = {
+            sort: array("l", (key[2] for key in keys)) for sort, keys in self.order_keys.items()
+        }
+        self._sort_sales()
+
+    def _sort_sales(self) -> None:
+        """Перестановки по продажам (popular — 30 дней, trending — 7 дней), по убыванию"""
+        for sort, sales in (("popular", self.sales_30d), ("trending", self.sales_7d)):
+            keys = sorted((-sales[i], -self.ids[i], i) for i in range(self.size))
+            self.orders[sort] = array("l", (key[2] for key in keys))
+            self.order_keys[sort] = keys
+
+    # === Фильтрация ===
+
+    def _price_bits(self, min_price: Optional[Decimal], max_price: Optional[Decimal]) -> int:
+        """Маска товаров с final_price в [min_price, max_price] — через bisect по отсортированным ценам"""
+        keys = self.order_keys["price_asc"]
+        low = 0
+        high = len(keys)
+        if min_price is not None:
+            min_kopecks = int((Decimal(min_price) * 100).to_integral_value(rounding=ROUND_CEILING))
+            low = bisect_left(keys, (min_kopecks,))
+        if max_price is not None:
+            max_kopecks = int((Decimal(max_price) * 100).to_integral_value(rounding=ROUND_FLOOR))
+            high = bisect_left(keys, (max_kopecks + 1,))
+        return _bits((key[2] for key in keys[low:high]), self.size)
+
+    def _group_masks(
+        self,
+        category_slugs: Optional[List[str]] = None,
+        brands: Optional[List[str]] = None,
+        in_stock: Optional[bool] = None,
+        on_sale: Optional[bool] = None,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        product_ids: Optional[Iterable[int]] = None,
+    ) -> Dict[str, int]:
+        """Маски заданных групп фильтров (category, brand, search, price, in_stock, on_sale)"""
+        masks = {}
+
+        if category_slugs:
+            category_ids = set()
+            for slug in category_slugs:
+                category_ids |= self.category_subtrees.get(slug, set())
+            # Неизвестные slug не фильтруют (как и в SQL-пути)
+            if category_ids:
+                category_mask = 0
+                for category_id in category_ids:
+                    category_mask |= self.category_bits.get(category_id, 0)
+                masks["category"] = category_mask
+
+        if brands:
+            brand_mask = 0
+            for brand in brands:
+                code = self._brand_code(brand)
+                if code:
+                    brand_mask |= self.brand_bits.get(code, 0)
+            masks["brand"] = brand_mask
+
+        if product_ids is not None:
+            masks["search"] = _bits(
+                (self.position_by_id[pid] for pid in product_ids if pid in self.position_by_id), self.size
+            )
+
+        if min_price is not None or max_price is not None:
+            masks["price"] = self._price_bits(min_price, max_price)
+
+        if in_stock is True:
+            masks["in_stock"] = self.in_stock_bits
+
+        if on_sale is True:
+            masks["on_sale"] = self.on_sale_bits
+
+        return masks
+
+    def filter(
+        self,
+        category_slugs: Optional[List[str]] = None,
+        brands: Optional[List[str]] = None,
+        in_stock: Optional[bool] = None,
+        on_sale: Optional[bool] = None,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        product_ids: Optional[Iterable[int]] = None,
+    ) -> int:
+        """Маска товаров, подходящих под фильтры (семантика как у SQL-пути list_products)"""
+        mask = self.all_bits
+        masks = self._group_masks(category_slugs, brands, in_stock, on_sale, min_price, max_price, product_ids)
+        for group_mask in masks.values():
+            mask &= group_mask
+        return mask
+
+    def facets(self, **filters) -> dict:
+        """
+        Фасеты для тех же фильтров, что и filter(): каждый считается без собственной группы
+        (drill-down). Один проход по товарам, прошедшим все группы, кроме
+        не более чем одной; количество категории включает товары подкатегорий
+        (по таблице замыкания), гистограмма цен — без фильтра по цене.
+        """
+        masks = self._group_masks(**filters)
+        # except_masks[name] — все группы, кроме name
+        except_masks = {}
+        for name in ("category", "brand", "price", "in_stock", "on_sale"):
+            mask = self.all_bits
+            for other, group_mask in masks.items():
+                if other != name:
+                    mask &= group_mask
+            except_masks[name] = mask
+        candidates = 0
+        for mask in except_masks.values():
+            candidates |= mask
+
+        length = (self.size + 7) // 8
+        candidate_mask = candidates.to_bytes(length, "little")
+        category_mask = except_masks["category"].to_bytes(length, "little")
+        brand_mask = except_masks["brand"].to_bytes(length, "little")
+        price_mask = except_masks["price"].to_bytes(length, "little")
+        stock_mask = except_masks["in_stock"].to_bytes(length, "little")
+        sale_mask = except_masks["on_sale"].to_bytes(length, "little")
+
+        category_counts: Dict[int, int] = {}
+        brand_counts: Dict[int, int] = {}
+        in_stock_count = on_sale_count = 0
+        prices = []
+        for position in range(self.size):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not candidate_mask[byte] & bit:
+                continue
+            if category_mask[byte] & bit and self.category_ids[position]:
+                category_id = self.category_ids[position]
+                category_counts[category_id] = category_counts.get(category_id, 0) + 1
+            if brand_mask[byte] & bit and self.brand_codes[position]:
+                code = self.brand_codes[position]
+                brand_counts[code] = brand_counts.get(code, 0) + 1
+            if stock_mask[byte] & bit and self.in_stock[position]:
+                in_stock_count += 1
+            if sale_mask[byte] & bit and self.on_sale[position]:
+                on_sale_count += 1
+            if price_mask[byte] & bit:
+                prices.append(self.final_prices[position])
+
+        # Сумма по поддереву: у товара одна категория, поэтому без двойного счёта
+        rolled_up: Dict[int, int] = {}
+        for category_id, count in category_counts.items():
+            for ancestor_id in self.category_ancestors.get(category_id, (category_id,)):
+                rolled_up[ancestor_id] = rolled_up.get(ancestor_id, 0) + count
+
+        price_min = from_kopecks(min(prices)) if prices else None
+        price_max = from_kopecks(max(prices)) if prices else None
+        return {
+            "categories": [{"category_id": cid, "count": count} for cid, count in sorted(rolled_up.items())],
+            "brands": [
+                {"brand": self.brands[code - 1], "count": count}
+                for code, count in sorted(brand_counts.items(), key=lambda item: (-item[1], self.brands[item[0] - 1]))
+            ],
+            "in_stock": in_stock_count,
+            "on_sale": on_sale_count,
+            "price_min": price_min,
+            "price_max": price_max,
+            "price_histogram": _price_histogram(prices, price_min, price_max),
+        }
+
+    def _brand_at(self, position: int) -> Optional[str]:
+        code = self.brand_codes[position]
+        return self.brands[code - 1] if code else None
+
+    def _brand_code(self, brand: str) -> int:
+        pos = bisect_left(self.brands, brand)
+        if pos < len(self.brands) and self.brands[pos] == brand:
+            return pos + 1
+        return 0
+
+    # === Сортировка и пагинация ===
+
+    def _sort_key(self, sort: str, position: int):
+        """Ключ сортировки в том же виде, что и в SQL-пути (для курсора)"""
+        if sort == "newest":
+            return _from_micros(self.created_at[position])
+        if sort == "name":
+            return self.names[position]
+        if sort == "popular":
+            return self.sales_30d[position]
+        if sort == "trending":
+            return self.sales_7d[position]
+        return from_kopecks(self.final_prices[position])
+
+    def _cursor_start(self, sort: str, cursor: str) -> int:
+        """Номер в перестановке сразу после позиции курсора"""
+        value, product_id = decode_cursor(cursor, sort)
+        if sort == "newest":
+            key = (-_to_micros(value), -product_id)
+        elif sort == "name":
+            key = (value, product_id)
+        elif sort in ("popular", "trending"):
+            key = (-value, -product_id)
+        elif sort == "price_asc":
+            key = (_to_kopecks(value), product_id)
+        else:
+            key = (-_to_kopecks(value), -product_id)
+        # Третий элемент (позиция) больше любой реальной — bisect_right встаёт после ключа
+        return bisect_right(self.order_keys[sort], key + (self.size,))
+
+    def page(
+        self,
+        mask: int,
+        sort: str,
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> List[Tuple[int, object]]:
+        """Товары страницы [(product_id, sort_key)] в порядке sort"""
+        if not mask:
+            return []
+
+        order = self.orders[sort]
+        start = self._cursor_start(sort, cursor) if cursor else 0
+        mask_bytes = mask.to_bytes((self.size + 7) // 8, "little")
+
+        result = []
+        skipped = 0
+        for rank in range(start, len(order)):
+            position = order[rank]
+            if not mask_bytes[position >> 3] >> (position & 7) & 1:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            result.append((self.ids[position], self._sort_key(sort, position)))
+            if len(result) >= limit:
+                break
+        return result
+
+    def page_ranked(
+        self,
+        mask: int,
+        ranked: List[Tuple[float, int]],
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Страница по внешнему рангу (sort=relevance): ranked — [(rank, product_id)]
+        по возрастанию rank. Возвращает [(product_id, rank)].
+        """
+        if not mask:
+            return []
+
+        start = bisect_right(ranked, decode_cursor(cursor, "relevance")) if cursor else 0
+        mask_bytes = mask.to_bytes((self.size + 7) // 8, "little")
+
+        result = []
+        skipped = 0
+        for rank, product_id in ranked[start:]:
+            position = self.position_by_id.get(product_id)
+            if position is None or not mask_bytes[position >> 3] >> (position & 7) & 1:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            result.append((product_id, rank))
+            if len(result) >= limit:
+                break
+        return result
+
+    @staticmethod
+    def count(mask: int) -> int:
+        return mask.bit_count()
+
+    # === Инкрементальные изменения ===
+
+    def copy(self) -> "CatalogIndex":
+        """Копия для патча: изменяемые патчами поля — свои, остальное общее"""
+        index = copy.copy(self)
+        index.in_stock = bytearray(self.in_stock)
+        index.featured = bytearray(self.featured)
+        index.sales_7d = array("q", self.sales_7d)
+        index.sales_30d = array("q", self.sales_30d)
+        index.orders = dict(self.orders)
+        index.order_keys = dict(self.order_keys)
+        return index
+
+    def patch_flags(self, product: Product) -> bool:
+        """Обновить наличие/«рекомендуемый» товара. False — нужна перестройка"""
+        position = self.position_by_id.get(product.id)
+        if position is None:
+            return False
+
+        bit = 1 << position
+        if bool(self.in_stock[position]) != bool(product.in_stock):
+            self.in_stock[position] = 1 if product.in_stock else 0
+            self.in_stock_bits ^= bit
+        if bool(self.featured[position]) != bool(product.is_featured):
+            self.featured[position] = 1 if product.is_featured else 0
+            self.featured_bits ^= bit
+        return True
+
+    def patch_sales(self, sales: Dict[int, Dict[str, int]]) -> bool:
+        """
+        Обновить счётчики продаж {product_id: {"sales_7d": ..., "sales_30d": ...}}.
+        True — изменился порядок popular/trending.
+        """
+        changed = False
+        for product_id, values in sales.items():
+            position = self.position_by_id.get(product_id)
+            if position is None:
+                continue
+            self.sales_7d[position] = values["sales_7d"]
+            self.sales_30d[position] = values["sales_30d"]
+            changed = True
+        if not changed:
+            return False
+
+        before = (self.orders["popular"], self.orders["trending"])
+        self._sort_sales()
+        return before != (self.orders["popular"], self.orders["trending"])
+
+    def matches(self, product: Product) -> bool:
+        """Совпадают ли с индексом поля, влияющие на сортировки и фильтры"""
+        position = self.position_by_id.get(product.id)
+        if position is None:
+            return not product.is_active
+
+        final_price = product.final_price if product.final_price is not None else product.price
+        return (
+            product.is_active
+            and self.category_ids[position] == (product.category_id or 0)
+            and self._brand_at(position) == (product.brand or None)
+            and self.names[position] == product.name
+            and self.created_at[position] == _to_micros(product.created_at)
+            and self.final_prices[position] == _to_kopecks(final_price)
+            and bool(self.on_sale[position]) == bool(product.is_on_sale)
+        )
+
+
+# === Глобальный индекс процесса ===
+
+_index: Optional[CatalogIndex] = None
+# Поколение индекса: сброс или патч во время построения не даёт сохранить устаревший индекс
+_generation = 0
+# _index_lock — одно построение за раз, _state_lock — замена _index и _generation
+_index_lock = threading.Lock()
+_state_lock = threading.Lock()
+
+
+def build_catalog_index(db: Session) -> CatalogIndex:
+    """Построить индекс по активным товарам и дереву категорий"""
+    # Цены читаются из БД — сначала пересчёт, если прошла граница акции;
+    # индекс актуален не дольше самих цен
+    valid_until = pricing.ensure_effective_prices(db)
+    products = db.exec(select(Product).where(Product.is_active == True)).all()
+
+    category_subtrees = {}
+    category_ancestors = {}
+    rows = db.exec(
+        select(Category.slug, CategoryClosure.ancestor_id, CategoryClosure.descendant_id)
+        .join(CategoryClosure, CategoryClosure.ancestor_id == Category.id)
+    ).all()
+    for slug, ancestor_id, descendant_id in rows:
+        category_subtrees.setdefault(slug, set()).add(descendant_id)
+        category_ancestors.setdefault(descendant_id, []).append(ancestor_id)
+
+    return CatalogIndex(products, category_subtrees, valid_until, category_ancestors)
+
+
+def get_catalog_index(db: Session) -> CatalogIndex:
+    """Актуальный индекс (перестраивается, если сброшен или наступила граница акции)"""
+    global _index
+
+    index = _index
+    if index is not None and datetime.utcnow() < index.valid_until:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is None or datetime.utcnow() >= index.valid_until:
+            generation = _generation
+            index = build_catalog_index(db)
+            with _state_lock:
+                # Запись во время построения — индекс мог прочитать данные до неё:
+                # отдаём его этому запросу, но не сохраняем
+                if generation == _generation:
+                    _index = index
+    return index
+
+
+def invalidate_catalog_index() -> None:
+    """Сбросить индекс — перестроится при следующем чтении"""
+    global _index, _generation
+    with _state_lock:
+        _generation += 1
+        _index = None
+
+
+def _begin_patch() -> Optional[CatalogIndex]:
+    """Отметить запись (идущее построение не сохранится) и вернуть текущий индекс"""
+    global _generation
+    with _state_lock:
+        _generation += 1
+        return _index
+
+
+def _replace_index(index: CatalogIndex, patched: CatalogIndex) -> None:
+    """Подменить индекс патченной копией; если его уже заменили — сбросить"""
+    global _index, _generation
+    with _state_lock:
+        if _index is index:
+            _index = patched
+            return
+        # Параллельный патч или сброс: наша копия его не содержит
+        _generation += 1
+        _index = None
+
+
+def patch_catalog_index(db: Session, product_ids: Iterable[int]) -> None:
+    """
+    Применить изменения товаров к индексу: только наличие/«рекомендуемый» —
+    патчем копии, всё остальное (цена, категория, активность, ...) — сбросом.
+    """
+    index = _begin_patch()
+    if index is None:
+        return
+
+    product_ids = list(product_ids)
+    products = db.exec(select(Product).where(col(Product.id).in_(product_ids))).all()
+    found = {p.id for p in products}
+
+    # Удалённый товар, который был в индексе
+    if any(pid in index.position_by_id for pid in product_ids if pid not in found):
+        invalidate_catalog_index()
+        return
+
+    if any(not index.matches(product) for product in products):
+        invalidate_catalog_index()
+        return
+
+    patched = index.copy()
+    for product in products:
+        if product.is_active:
+            patched.patch_flags(product)
+    _replace_index(index, patched)
+
+
+def patch_catalog_sales(sales: Dict[int, Dict[str, int]]) -> bool:
+    """
+    Применить изменённые счётчики продаж к индексу (services/sales).
+    True — порядок по продажам мог измениться (индекса нет — неизвестно).
+    """
+    index = _begin_patch()
+    if index is None:
+        return True
+    patched = index.copy()
+    changed = patched.patch_sales(sales)
+    _replace_index(index, patched)
+    return changed
@@ -0,0 +1,109 @@
+"""Версия каталога (и версия популярности) для условных GET и кэша ответов."""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from sqlmodel import Session
+from app.services.pricing import next_promotion_boundary
+
+_version: int = int(time.time() * 1000)
+_modified_at: datetime = datetime.now(timezone.utc).replace(microsecond=0)
+
+# Версия порядка по продажам и время его изменения
+_popularity_version: int = _version
+_popularity_modified_at: datetime = _modified_at
+
+# Момент следующей границы акции или полночи; None — ещё не вычислялся после последнего bump
+_valid_until: Optional[datetime] = None
+_lock = threading.Lock()
+
+
+def _next_version() -> int:
+    """Следующее значение общего счётчика (вызывается под _lock)"""
+    return max(_version + 1, _popularity_version + 1, int(time.time() * 1000))
+
+
+def _next_modified_at(modified_at: datetime) -> datetime:
+    # Last-Modified с точностью до секунды — строго растёт, как и версия
+    return max(datetime.now(timezone.utc).replace(microsecond=0), modified_at + timedelta(seconds=1))
+
+
+def bump_catalog_version() -> int:
+    """Каталог изменился: новая версия и время изменения"""
+    global _version, _modified_at, _valid_until
+    with _lock:
+        _version = _next_version()
+        _modified_at = _next_modified_at(max(_modified_at, _popularity_modified_at))
+        _valid_until = None
+        return _version
+
+
+def bump_popularity_version() -> int:
+    """Изменился порядок товаров по продажам: новая версия только для ответов, зависящих от него"""
+    global _popularity_version, _popularity_modified_at
+    with _lock:
+        _popularity_version = _next_version()
+        _popularity_modified_at = _next_modified_at(max(_modified_at, _popularity_modified_at))
+        return _popularity_version
+
+
+def get_catalog_version(db: Session, sales: bool = False) -> int:
+    """
+    Текущая версия каталога; sales=True — с учётом порядка по продажам.
+    В БД обращается только для поиска следующей границы акции — после записи
+    в каталог или когда граница прошла.
+    """
+    global _valid_until
+    now = datetime.utcnow()
+    valid_until = _valid_until
+    if valid_until is not None and now < valid_until:
+        return max(_version, _popularity_version) if sales else _version
+
+    if valid_until is not None:
+        # Акция началась или закончилась — цены и список акций другие;
+        # новый день — другие окна продаж
+        bump_catalog_version()
+    midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    _valid_until = min(next_promotion_boundary(db, now), midnight)
+    return max(_version, _popularity_version) if sales else _version
+
+
+def catalog_etag(version: int) -> str:
+    """Сильный ETag для версии каталога"""
+    return f'"catalog-{version}"'
+
+
+def catalog_last_modified(sales: bool = False) -> str:
+    """Значение заголовка Last-Modified (HTTP-date)"""
+    return format_datetime(_last_modified(sales), usegmt=True)
+
+
+def _last_modified(sales: bool) -> datetime:
+    return max(_modified_at, _popularity_modified_at) if sales else _modified_at
+
+
+def is_not_modified(
+    etag: str,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    sales: bool = False,
+) -> bool:
+    """
+    Условный запрос совпадает с текущей версией.
+    If-None-Match приоритетнее If-Modified-Since (RFC 9110, 13.2.2).
+    """
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return _last_modified(sales) <= since
+
+    return False
@@ -0,0 +1,127 @@
+"""Дерево категорий через таблицу замыкания (category_closure)."""
+from typing import List, Set
+from sqlalchemy import text, delete, insert, literal
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select, col
+from app.models.category import Category, CategoryClosure
+
+# Защита от циклов в parent_id при полной перестройке
+MAX_TREE_DEPTH = 64
+
+
+def get_subtree_ids(db: Session, category_ids: List[int]) -> Set[int]:
+    """Категории и все их потомки"""
+    if not category_ids:
+        return set()
+    stmt = select(CategoryClosure.descendant_id).where(col(CategoryClosure.ancestor_id).in_(category_ids))
+    return set(db.exec(stmt).all())
+
+
+def get_subtree_ids_by_slugs(db: Session, slugs: List[str]) -> Set[int]:
+    """Категории с указанными slug и все их потомки — одним запросом"""
+    if not slugs:
+        return set()
+    stmt = (
+        select(CategoryClosure.descendant_id)
+        .join(Category, Category.id == CategoryClosure.ancestor_id)
+        .where(col(Category.slug).in_(slugs))
+    )
+    return set(db.exec(stmt).all())
+
+
+def get_ancestor_ids(db: Session, category_id: int) -> List[int]:
+    """Предки категории от корня к самой категории (включительно)"""
+    stmt = (
+        select(CategoryClosure.ancestor_id)
+        .where(CategoryClosure.descendant_id == category_id)
+        .order_by(CategoryClosure.depth.desc())
+    )
+    return list(db.exec(stmt).all())
+
+
+def is_descendant(db: Session, ancestor_id: int, category_id: int) -> bool:
+    """Является ли category_id потомком ancestor_id (или им самим)"""
+    stmt = select(CategoryClosure.depth).where(
+        CategoryClosure.ancestor_id == ancestor_id,
+        CategoryClosure.descendant_id == category_id,
+    )
+    return db.exec(stmt).first() is not None
+
+
+def add_category_closure(db: Session, category: Category) -> None:
+    """Пути для новой категории: она сама + все предки родителя"""
+    db.add(CategoryClosure(ancestor_id=category.id, descendant_id=category.id, depth=0))
+    if category.parent_id:
+        parent_paths = select(
+            CategoryClosure.ancestor_id,
+            literal(category.id),
+            CategoryClosure.depth + 1,
+        ).where(CategoryClosure.descendant_id == category.parent_id)
+        db.exec(insert(CategoryClosure).from_select(["ancestor_id", "descendant_id", "depth"], parent_paths))
+
+
+def move_category_subtree(db: Session, category_id: int, new_parent_id: int | None) -> None:
+    """
+    Перенести поддерево category_id под new_parent_id (None — в корень).
+    Проверку на цикл делает вызывающий код (is_descendant).
+    """
+    subtree = select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+    old_ancestors = select(CategoryClosure.ancestor_id).where(
+        CategoryClosure.descendant_id == category_id,
+        CategoryClosure.ancestor_id != category_id,
+    )
+
+    # Отрываем поддерево от старых предков
+    db.exec(
+        delete(CategoryClosure).where(
+            col(CategoryClosure.descendant_id).in_(subtree),
+            col(CategoryClosure.ancestor_id).in_(old_ancestors),
+        )
+    )
+
+    # Привязываем к предкам нового родителя: (предки родителя) × (поддерево)
+    if new_parent_id:
+        parent_paths = aliased(CategoryClosure)
+        subtree_paths = aliased(CategoryClosure)
+        new_paths = select(
+            parent_paths.ancestor_id,
+            subtree_paths.descendant_id,
+            parent_paths.depth + subtree_paths.depth + 1,
+        ).where(
+            parent_paths.descendant_id == new_parent_id,
+            subtree_paths.ancestor_id == category_id,
+        )
+        db.exec(insert(CategoryClosure).from_select(["ancestor_id", "descendant_id", "depth"], new_paths))
+
+
+def remove_category_closure(db: Session, category_id: int) -> None:
+    """
+    Удалить категорию из дерева. Дочерние категории становятся корнями
+    (как и раньше: их parent_id указывает на удалённую категорию).
+    """
+    move_category_subtree(db, category_id, None)
+    db.exec(
+        delete(CategoryClosure).where(
+            (CategoryClosure.ancestor_id == category_id) | (CategoryClosure.descendant_id == category_id)
+        )
+    )
+
+
+def rebuild_category_closure(db: Session) -> None:
+    """Полностью перестроить таблицу замыкания по parent_id (рекурсивный CTE)"""
+    db.exec(delete(CategoryClosure))
+    db.exec(
+        text(
+            "INSERT INTO category_closure (ancestor_id, descendant_id, depth) "
+            "WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS ("
+            "  SELECT id, id, 0 FROM categories"
+            "  UNION ALL"
+            "  SELECT tree.ancestor_id, categories.id, tree.depth + 1"
+            "  FROM tree JOIN categories ON categories.parent_id = tree.descendant_id"
+            "  WHERE tree.depth < :max_depth"
+            ") SELECT ancestor_id, descendant_id, MIN(depth) FROM tree"
+            " GROUP BY ancestor_id, descendant_id"
+        ),
+        params={"max_depth": MAX_TREE_DEPTH},
+    )
+    db.commit()
@@ -0,0 +1,152 @@
+"""«С этим товаром покупают»: in-memory индекс совместных покупок."""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional, Iterable, List, Dict
+import threading
+from sqlmodel import Session, select, col
+from app.models.order import Order, OrderItem
+from app.services.catalog_index import get_catalog_index
+from app.services.catalog_version import bump_popularity_version
+from app.services.pricing import PromotionSnapshot
+from app.services.product_cards import load_product_cards
+from app.services.sales import EXCLUDED_ORDER_STATUSES
+
+# Сколько соседей хранить для каждого товара
+TOP_K = 20
+
+REBUILD_INTERVAL = timedelta(hours=6)
+
+
+class CoPurchaseIndex:
+    """Совместные покупки: счётчики пар и top-k соседей каждого товара"""
+
+    def __init__(self, baskets: Iterable[Iterable[int]]):
+        self.built_at = datetime.utcnow()
+        self._lock = threading.Lock()
+        self._counts: Dict[int, Counter] = {}
+        self._top: Dict[int, List[int]] = {}
+
+        for basket in baskets:
+            self._add(set(basket), 1)
+        for product_id in self._counts:
+            self._top[product_id] = self._rank(product_id)
+
+    # === Запрос ===
+
+    def neighbours(self, product_id: int) -> List[int]:
+        """Соседи товара по убыванию числа совместных заказов"""
+        return self._top.get(product_id, [])
+
+    def for_basket(self, product_ids: Iterable[int]) -> List[int]:
+        """
+        Рекомендации для набора товаров (корзина): соседи всех товаров,
+        ранжированные по сумме совместных заказов, без самих товаров набора.
+        """
+        basket = set(product_ids)
+        scores = Counter()
+        with self._lock:
+            for product_id in basket:
+                counts = self._counts.get(product_id)
+                if counts is None:
+                    continue
+                for neighbour in self._top.get(product_id, []):
+                    if neighbour not in basket:
+                        scores[neighbour] += counts[neighbour]
+        return [pid for pid, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
+
+    # === Изменения ===
+
+    def record(self, basket: Iterable[int], sign: int = 1) -> None:
+        """Учесть (sign=1) или снять (sign=-1) заказ с товарами basket"""
+        basket = set(basket)
+        if len(basket) < 2:
+            return
+        with self._lock:
+            self._add(basket, sign)
+            for product_id in basket:
+                self._top[product_id] = self._rank(product_id)
+
+    def _add(self, basket: set, sign: int) -> None:
+        if len(basket) < 2:
+            return
+        for product_id in basket:
+            counts = self._counts.setdefault(product_id, Counter())
+            for other in basket:
+                if other == product_id:
+                    continue
+                counts[other] += sign
+                if counts[other] <= 0:
+                    del counts[other]
+
+    def _rank(self, product_id: int) -> List[int]:
+        counts = self._counts.get(product_id) or {}
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return [other for other, _ in ranked[:TOP_K]]
+
+
+# === Глобальный индекс процесса ===
+
+_index: Optional[CoPurchaseIndex] = None
+_index_lock = threading.Lock()
+
+
+def build_co_purchase_index(db: Session) -> CoPurchaseIndex:
+    """Построить индекс по всем учитываемым заказам"""
+    rows = db.exec(
+        select(OrderItem.order_id, OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(col(Order.status).not_in(EXCLUDED_ORDER_STATUSES))
+    ).all()
+
+    baskets: Dict[int, set] = {}
+    for order_id, product_id in rows:
+        baskets.setdefault(order_id, set()).add(product_id)
+    return CoPurchaseIndex(baskets.values())
+
+
+def get_co_purchase_index(db: Session) -> CoPurchaseIndex:
+    """Актуальный индекс (перестраивается после сброса и раз в REBUILD_INTERVAL)"""
+    global _index
+
+    index = _index
+    if index is not None and datetime.utcnow() - index.built_at < REBUILD_INTERVAL:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is None or datetime.utcnow() - index.built_at >= REBUILD_INTERVAL:
+            index = build_co_purchase_index(db)
+            _index = index
+    return index
+
+
+def invalidate_co_purchase_index() -> None:
+    """Сбросить индекс — перестроится при следующем запросе"""
+    global _index
+    _index = None
+
+
+def record_order_co_purchases(order: Order, sign: int = 1) -> None:
+    """Применить заказ к индексу (вызывается вместе с sales.record_order_sales)"""
+    basket = {item.product_id for item in order.items}
+    if len(basket) < 2:
+        # Один товар — совместных покупок нет
+        return
+
+    index = _index
+    if index is not None:
+        index.record(basket, sign)
+    bump_popularity_version()
+
+
+def also_bought_cards(
+    db: Session,
+    candidate_ids: Iterable[int],
+    limit: int,
+    promotions: Optional[PromotionSnapshot] = None,
+) -> List[dict]:
+    """Карточки первых limit активных товаров из рекомендаций (одной загрузкой)"""
+    active = get_catalog_index(db).position_by_id
+    product_ids = [pid for pid in candidate_ids if pid in active][:limit]
+    cards, _ = load_product_cards(db, product_ids, active_only=True, promotions=promotions)
+    return cards
@@ -0,0 +1,59 @@
+"""
+Непрозрачные курсоры keyset-пагинации каталога: base64url(JSON [sort, ключ, id]).
+Общий формат для SQL-пути (services/catalog) и in-memory индекса (services/catalog_index).
+"""
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+import base64
+import json
+import math
+from fastapi import HTTPException
+
+
+def encode_cursor(sort: str, sort_key, product_id: int) -> str:
+    """Непрозрачный курсор: позиция сразу после (sort_key, product_id) в порядке sort"""
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    elif isinstance(sort_key, Decimal):
+        sort_key = str(sort_key)
+    
+    payload = json.dumps([sort, sort_key, product_id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """Разобрать курсор в (значение ключа, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, product_id = json.loads(base64.urlsafe_b64decode(padded))
+        
+        if cursor_sort != sort or not _is_int64(product_id):
+            raise ValueError("sort mismatch")
+        
+        if sort == "newest":
+            value = datetime.fromisoformat(value)
+            # created_at хранится в naive UTC; aware-время приводим к нему
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        elif sort in ("price_asc", "price_desc"):
+            value = Decimal(value)
+            if not value.is_finite():
+                raise ValueError("bad price")
+        elif sort == "relevance":
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError("bad rank")
+        elif sort in ("popular", "trending"):
+            if not _is_int64(value):
+                raise ValueError("bad sales")
+        elif not isinstance(value, str):
+            raise ValueError("bad name")
+    except (ValueError, TypeError, InvalidOperation, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return value, product_id
+
+
+def _is_int64(value) -> bool:
+    """Целое, которое можно передать в SQLite (bool — не целое)"""
+    return isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63
@@ -0,0 +1,60 @@
+"""Sparse fieldsets: ?fields=id,name,final_price ограничивает поля ответа."""
+from typing import Any, Dict, List, Optional, Tuple, Type
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, ConfigDict, create_model
+from app.services.response_cache import serialize_response
+
+_models: Dict[Tuple, Type[BaseModel]] = {}
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[List[str]]:
+    """Запрошенные поля в порядке схемы; None — все поля"""
+    if not fields:
+        return None
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    requested.add("id")
+    return [name for name in model.model_fields if name in requested]
+
+
+def partial_model(model: Type[BaseModel], fields: Optional[List[str]]) -> Type[BaseModel]:
+    """Модель только с полями fields (None — исходная модель)"""
+    if fields is None:
+        return model
+
+    key = (model, tuple(fields))
+    partial = _models.get(key)
+    if partial is None:
+        partial = create_model(
+            f"{model.__name__}Fields",
+            __config__=ConfigDict(from_attributes=True),
+            **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields},
+        )
+        _models[key] = partial
+    return partial
+
+
+def partial_list_model(list_model: Type[BaseModel], item_model: Type[BaseModel], fields: Optional[List[str]]) -> Type[BaseModel]:
+    """Модель списка (items + пагинация), у которой элементы урезаны до fields"""
+    if fields is None:
+        return list_model
+
+    key = (list_model, item_model, tuple(fields))
+    partial = _models.get(key)
+    if partial is None:
+        partial = create_model(
+            f"{list_model.__name__}Fields",
+            __base__=list_model,
+            items=(List[partial_model(item_model, fields)], ...),
+        )
+        _models[key] = partial
+    return partial
+
+
+def fields_response(response_model: Any, content: Any) -> Response:
+    """JSON-ответ по (урезанной) модели"""
+    return Response(content=serialize_response(response_model, content), media_type="application/json")
@@ -1,13 +1,15 @@
 from decimal import Decimal
 from datetime import datetime
 import secrets
-from sqlmodel import Session, select
+from sqlmodel import Session, select, col
 from fastapi import HTTPException
 from app.models.order import Order, OrderItem, OrderStatus
 from app.models.product import Product
 from app.models.promotion import Promotion, PromotionType
 from app.schemas.order import OrderCreate
-from app.services.pricing import apply_promotions
+from app.services.pricing import get_promotion_snapshot, price_products
+from app.services.sales import record_order_sales
+from app.services.co_purchase import record_order_co_purchases
 
 
 def generate_order_number() -> str:
@@ -47,8 +49,16 @@ def create_order(db: Session, data: OrderCreate, user_id: int | None = None) ->
     order_items = []
     subtotal = Decimal("0")
     
+    # Товары заказа одним запросом, цены — одним проходом по снимку акций
+    requested_ids = [item_data.product_id for item_data in data.items]
+    products = {
+        p.id: p for p in db.exec(select(Product).where(col(Product.id).in_(requested_ids))).all()
+    }
+    priced = list(products.values())
+    prices = dict(zip((p.id for p in priced), price_products(priced, get_promotion_snapshot(db))))
+    
     for item_data in data.items:
-        product = db.get(Product, item_data.product_id)
+        product = products.get(item_data.product_id)
         
         if not product or not product.is_active:
             raise HTTPException(status_code=400, detail=f"Product {item_data.product_id} not found")
@@ -60,8 +70,8 @@ def create_order(db: Session, data: OrderCreate, user_id: int | None = None) ->
                 detail=f"Product {product.name} is out of stock"
             )
         
-        # Рассчитываем финальную цену с учетом скидок и промоакций
-        final_price, _ = apply_promotions(product, db)
+        # Финальная цена с учетом скидок и промоакций
+        final_price, _ = prices[product.id]
         item_total = final_price * item_data.quantity
         
         order_items.append({
@@ -127,6 +137,10 @@ def create_order(db: Session, data: OrderCreate, user_id: int | None = None) ->
     db.commit()
     db.refresh(order)
     
+    # Счётчики продаж для sort=popular и совместные покупки
+    record_order_sales(db, order)
+    record_order_co_purchases(order)
+    
     return order
 
 
@@ -0,0 +1,101 @@
+"""
+Целочисленное ядро расчёта цен в копейках (совпадает с calculate_discount / select_best_promotion).
+Цена после скидки — точно в 1/SCALE копейки, до копейки — округление половины к чётному.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Optional, Tuple, List
+from app.models.promotion import Promotion, PromotionType
+
+# Точность промежуточной цены: 1/10000 копейки
+SCALE = 10000
+
+# Условие акции для ядра: (процентная?, значение) — сотые доли процента или копейки
+Term = Tuple[bool, int]
+
+
+def to_kopecks(value: Optional[Decimal]) -> Optional[int]:
+    """Decimal -> копейки (None остаётся None)"""
+    if value is None:
+        return None
+    return int((Decimal(value) * 100).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_kopecks(value: int) -> Decimal:
+    """Копейки -> Decimal с двумя знаками"""
+    return Decimal(value).scaleb(-2)
+
+
+def promotion_term(promo: Promotion) -> Optional[Term]:
+    """Условие акции для ядра; None — тип без скидки"""
+    if promo.type == PromotionType.PERCENT:
+        return True, to_kopecks(promo.value)
+    if promo.type == PromotionType.FIXED:
+        return False, to_kopecks(promo.value)
+    return None
+
+
+def _round_half_even(numerator: int, denominator: int) -> int:
+    """numerator / denominator с округлением половины к чётному (denominator > 0)"""
+    quotient, remainder = divmod(numerator, denominator)
+    twice = remainder * 2
+    if twice > denominator or (twice == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def _truncate_div(numerator: int, denominator: int) -> int:
+    """Деление с отбрасыванием дробной части к нулю (как int(Decimal))"""
+    quotient = abs(numerator) // abs(denominator)
+    return quotient if (numerator >= 0) == (denominator > 0) else -quotient
+
+
+def discounted(base: int, term: Term) -> int:
+    """Точная цена после скидки, в 1/SCALE копейки"""
+    is_percent, value = term
+    if is_percent:
+        return base * SCALE - base * value
+    return max(base - value, 0) * SCALE
+
+
+def best_term(base: int, terms: List[Optional[Term]]) -> Tuple[Optional[int], int]:
+    """
+    (индекс лучшего условия или None, точная цена в 1/SCALE копейки):
+    строго меньшая цена побеждает, при равенстве остаётся первое условие.
+    """
+    best = None
+    best_price = base * SCALE
+    for index, term in enumerate(terms):
+        if term is None:
+            continue
+        price = discounted(base, term)
+        if price < best_price:
+            best_price = price
+            best = index
+    return best, best_price
+
+
+def final_price(base: int, old_price: Optional[int], terms: List[Optional[Term]]) -> Tuple[int, Optional[int]]:
+    """
+    (final_price в копейках, discount_percent) для базовой цены base.
+    old_price выше base — скидка самого товара, акции не применяются;
+    иначе terms — кандидаты (одна группа scope/priority, см. PromotionSnapshot).
+    discount_percent отбрасывает дробную часть и считается по цене до округления.
+    """
+    price, discount_percent, _ = final_price_with_term(base, old_price, terms)
+    return price, discount_percent
+
+
+def final_price_with_term(
+    base: int,
+    old_price: Optional[int],
+    terms: List[Optional[Term]],
+) -> Tuple[int, Optional[int], Optional[int]]:
+    """Как final_price, плюс индекс применённого условия в terms (None — акция не применена)"""
+    if old_price and old_price > base:
+        return base, _truncate_div((old_price - base) * 100, old_price), None
+
+    best, best_price = best_term(base, terms)
+    if best is None:
+        return base, None, None
+    discount_percent = _truncate_div((base * SCALE - best_price) * 100, base * SCALE)
+    return _round_half_even(best_price, SCALE), discount_percent, best
@@ -1,9 +1,14 @@
 from decimal import Decimal
-from datetime import datetime
-from typing import Optional, Tuple, List
-from sqlmodel import Session, select
+from datetime import datetime, timedelta
+from typing import Optional, Tuple, List, Iterable, Dict, Union, Sequence, Hashable
+import json
+import re
+import threading
+from sqlmodel import Session, select, col, func
 from app.models.product import Product
-from app.models.promotion import Promotion, PromotionType, PromotionScope
+from app.models.promotion import Promotion, PromotionType, PromotionScope, PromotionTarget
+from app.services import price_kernel
+from app.services.price_kernel import to_kopecks, from_kopecks
 
 
 # Приоритет scope: product > category > all
@@ -27,6 +32,26 @@ def get_active_promotions(db: Session) -> List[Promotion]:
     return list(db.exec(stmt).all())
 
 
+def parse_target_ids(target_ids: Optional[str]) -> List[int]:
+    """id категорий/товаров акции из target_ids (JSON-массив; на всякий случай и «1,2,3»)"""
+    if not target_ids:
+        return []
+    try:
+        values = json.loads(target_ids)
+    except ValueError:
+        values = re.findall(r"\d+", target_ids)
+    if not isinstance(values, list):
+        values = [values]
+    
+    ids = []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
 def get_applicable_promotions(product: Product, promotions: List[Promotion]) -> List[Promotion]:
     """Фильтровать акции применимые к продукту"""
     applicable = []
@@ -35,10 +60,10 @@ def get_applicable_promotions(product: Product, promotions: List[Promotion]) ->
         if promo.scope == PromotionScope.ALL:
             applicable.append(promo)
         elif promo.scope == PromotionScope.CATEGORY and product.category_id:
-            if promo.target_ids and str(product.category_id) in promo.target_ids:
+            if product.category_id in parse_target_ids(promo.target_ids):
                 applicable.append(promo)
         elif promo.scope == PromotionScope.PRODUCT:
-            if promo.target_ids and str(product.id) in promo.target_ids:
+            if product.id in parse_target_ids(promo.target_ids):
                 applicable.append(promo)
     
     return applicable
@@ -93,84 +118,418 @@ def select_best_promotion(base_price: Decimal, promotions: List[Promotion]) -> O
     return best
 
 
+def price_with_promotions(
+    product: Product,
+    promotions: Union[List[Promotion], "PromotionSnapshot"],
+) -> Tuple[Decimal, Optional[int]]:
+    """
+    Рассчитать финальную цену по заранее загруженным активным акциям
+    (списку или скомпилированному снимку).
+    Возвращает (final_price, discount_percent)
+    """
+    if isinstance(promotions, PromotionSnapshot):
+        applicable = promotions.candidates(product)
+    else:
+        applicable = get_applicable_promotions(product, promotions)
+    return _final_price(product.price, product.old_price, applicable)
+
+
+def _final_price(
+    base_price: Decimal,
+    old_price: Optional[Decimal],
+    applicable: List[Promotion],
+) -> Tuple[Decimal, Optional[int]]:
+    """
+    (final_price, discount_percent) по базовой цене, old_price и применимым акциям.
+    Считается в копейках (services/price_kernel) — тот же результат, что
+    select_best_promotion + calculate_discount + quantize.
+    """
+    if applicable:
+        # Кандидаты — как в select_best_promotion: самый узкий scope, затем максимальный priority
+        max_scope = max(SCOPE_PRIORITY[promo.scope] for promo in applicable)
+        applicable = _top_priority([promo for promo in applicable if SCOPE_PRIORITY[promo.scope] == max_scope])
+    final_price, discount_percent = price_kernel.final_price(
+        to_kopecks(base_price),
+        to_kopecks(old_price),
+        [price_kernel.promotion_term(promo) for promo in applicable],
+    )
+    return from_kopecks(final_price), discount_percent
+
+
+def price_products(
+    products: Sequence,
+    promotions: Union["PromotionSnapshot", Iterable[Promotion]],
+) -> List[Tuple[Decimal, Optional[int]]]:
+    """
+    Цены многих товаров за один проход: [(final_price, discount_percent)]
+    в порядке products. products — товары или лёгкие строки с атрибутами
+    id, category_id, price, old_price; promotions — снимок активных акций
+    (или список акций, например черновик).
+    """
+    return [
+        (from_kopecks(final_price), discount_percent)
+        for final_price, discount_percent in price_products_kopecks(products, promotions)
+    ]
+
+
+def price_products_kopecks(
+    products: Sequence,
+    promotions: Union["PromotionSnapshot", Iterable[Promotion]],
+) -> List[Tuple[int, Optional[int]]]:
+    """
+    То же, что price_products, но final_price — в копейках (без Decimal).
+    
+    Товары группируются по набору акций-кандидатов (свои product-акции,
+    иначе акции категории, иначе scope=all), и лучшая акция выбирается
+    один раз на (группа, базовая цена) целочисленным ядром price_kernel,
+    поэтому результат совпадает с price_with_promotions для каждого товара.
+    """
+    if not isinstance(promotions, PromotionSnapshot):
+        promotions = PromotionSnapshot(list(promotions), datetime.max)
+    
+    results = []
+    computed: Dict[Tuple[Hashable, int], Tuple[int, Optional[int]]] = {}
+    for product in products:
+        base_price = to_kopecks(product.price)
+        old_price = to_kopecks(product.old_price)
+        if old_price and old_price > base_price:
+            results.append(price_kernel.final_price(base_price, old_price, []))
+            continue
+        
+        group, terms = promotions.group_terms(product)
+        key = (group, base_price)
+        price = computed.get(key)
+        if price is None:
+            price = computed[key] = price_kernel.final_price(base_price, None, terms)
+        results.append(price)
+    return results
+
+
 def apply_promotions(product: Product, db: Session = None) -> Tuple[Decimal, Optional[int]]:
     """
     Рассчитать финальную цену с учётом акций.
     Возвращает (final_price, discount_percent)
     """
-    base_price = product.price
+    # Если передана сессия — учитываем активные промоакции (снимок из памяти)
+    promotions = get_promotion_snapshot(db) if db else []
+    return price_with_promotions(product, promotions)
+
+
+# === Скомпилированный снимок активных акций ===
+
+def _top_priority(promotions: List[Promotion]) -> List[Promotion]:
+    """Акции группы с максимальным priority (порядок сохраняется)"""
+    max_priority = max(p.priority for p in promotions)
+    return [p for p in promotions if p.priority == max_priority]
+
+
+class PromotionSnapshot:
+    """
+    Активные акции, разобранные один раз: по scope, категории и товару.
+    В каждой группе остаются только акции с максимальным priority —
+    select_best_promotion выбирает только из них, поэтому кандидаты
+    для товара — пара поисков в словаре.
+    """
+
+    def __init__(
+        self,
+        promotions: List[Promotion],
+        valid_until: datetime,
+        targets: Optional[Dict[int, List[int]]] = None,
+    ):
+        """targets — {promotion_id: [target_id]} из promotion_targets; None — из target_ids"""
+        self.promotions = promotions
+        self.valid_until = valid_until
+        self.targets = targets
+
+        by_product: Dict[int, List[Promotion]] = {}
+        by_category: Dict[int, List[Promotion]] = {}
+        for_all: List[Promotion] = []
+        for promo in promotions:
+            if promo.scope == PromotionScope.ALL:
+                for_all.append(promo)
+                continue
+            if targets is not None:
+                target_ids = targets.get(promo.id, [])
+            else:
+                target_ids = dict.fromkeys(parse_target_ids(promo.target_ids))
+            if promo.scope == PromotionScope.CATEGORY:
+                for category_id in target_ids:
+                    by_category.setdefault(category_id, []).append(promo)
+            elif promo.scope == PromotionScope.PRODUCT:
+                for product_id in target_ids:
+                    by_product.setdefault(product_id, []).append(promo)
+
+        self.by_product = {pid: _top_priority(group) for pid, group in by_product.items()}
+        self.by_category = {cid: _top_priority(group) for cid, group in by_category.items()}
+        self.for_all = _top_priority(for_all) if for_all else []
+        # Условия акций групп для price_kernel (копейки), по ключу группы — лениво
+        self._terms: Dict[Hashable, List[Optional[price_kernel.Term]]] = {}
+
+    def with_promotion(self, promotion: Promotion) -> "PromotionSnapshot":
+        """Снимок с ещё одной акцией (например, черновиком); её цели — из target_ids"""
+        targets = self.targets
+        if targets is not None:
+            targets = {**targets, promotion.id: list(dict.fromkeys(parse_target_ids(promotion.target_ids)))}
+        return PromotionSnapshot(self.promotions + [promotion], self.valid_until, targets)
+
+    def candidates(self, product: Product) -> List[Promotion]:
+        """Акции, из которых выбирается лучшая: группа самого узкого scope"""
+        return self.group(product)[1]
+
+    def group(self, product) -> Tuple[Hashable, List[Promotion]]:
+        """(ключ группы, кандидаты): у товаров одной группы одинаковые кандидаты"""
+        promotions = self.by_product.get(product.id)
+        if promotions:
+            return ("product", product.id), promotions
+        if product.category_id:
+            promotions = self.by_category.get(product.category_id)
+            if promotions:
+                return ("category", product.category_id), promotions
+        return ("all",), self.for_all
+
+    def group_terms(self, product) -> Tuple[Hashable, List[Optional[price_kernel.Term]]]:
+        """(ключ группы, условия кандидатов для price_kernel)"""
+        group, promotions = self.group(product)
+        terms = self._terms.get(group)
+        if terms is None:
+            terms = self._terms[group] = [price_kernel.promotion_term(promo) for promo in promotions]
+        return group, terms
+
+
+_snapshot: Optional[PromotionSnapshot] = None
+# Поколение снимка: сброс во время построения не даёт сохранить устаревший снимок
+_snapshot_generation = 0
+_snapshot_lock = threading.Lock()
+
+
+def get_promotion_snapshot(db: Session) -> PromotionSnapshot:
+    """
+    Снимок активных акций. Строится парой запросов и живёт до ближайшего
+    starts_at/ends_at акции или до записи акций (invalidate_promotion_snapshot).
+    """
+    global _snapshot
+    
+    now = datetime.utcnow()
+    snapshot = _snapshot
+    if snapshot is not None and now < snapshot.valid_until:
+        return snapshot
+    
+    generation = _snapshot_generation
+    # Копии без сессии: снимок переживает запрос, в котором построен
+    promotions = [Promotion(**promo.model_dump()) for promo in get_active_promotions(db)]
+    
+    # Цели акций — из нормализованной таблицы (services/promotion_targets)
+    targets: Dict[int, List[int]] = {}
+    if promotions:
+        rows = db.exec(
+            select(PromotionTarget.promotion_id, PromotionTarget.target_id)
+            .where(col(PromotionTarget.promotion_id).in_([p.id for p in promotions]))
+            .order_by(PromotionTarget.promotion_id, PromotionTarget.target_id)
+        ).all()
+        for promotion_id, target_id in rows:
+            targets.setdefault(promotion_id, []).append(target_id)
+    
+    snapshot = PromotionSnapshot(promotions, next_promotion_boundary(db, now), targets)
+    
+    with _snapshot_lock:
+        if generation == _snapshot_generation:
+            _snapshot = snapshot
+    return snapshot
+
+
+def invalidate_promotion_snapshot() -> None:
+    """Акции изменены — снимок перестроится при следующем обращении"""
+    global _snapshot, _snapshot_generation
+    with _snapshot_lock:
+        _snapshot_generation += 1
+        _snapshot = None
+
+
+# === Материализованная эффективная цена ===
+
+# Момент, до которого материализованные цены актуальны (ближайший starts_at/ends_at).
+# None — цены ещё не пересчитывались в этом процессе.
+_prices_valid_until: Optional[datetime] = None
+_refresh_lock = threading.Lock()
+
+
+def next_promotion_boundary(db: Session, now: datetime) -> datetime:
+    """Ближайший момент, когда какая-либо акция начнётся или закончится"""
+    next_start = db.exec(
+        select(func.min(Promotion.starts_at)).where(
+            Promotion.is_active == True,
+            Promotion.starts_at > now,
+        )
+    ).one()
+    next_end = db.exec(
+        select(func.min(Promotion.ends_at)).where(
+            Promotion.is_active == True,
+            Promotion.ends_at >= now,
+        )
+    ).one()
+    
+    boundaries = [datetime.max]
+    if next_start:
+        boundaries.append(next_start)
+    if next_end:
+        # Акция активна включительно по ends_at, заканчивается сразу после
+        boundaries.append(next_end + timedelta(microseconds=1))
+    return min(boundaries)
+
+
+def refresh_effective_prices(db: Session, product_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Пересчитать final_price / discount_percent / is_on_sale.
+    Без product_ids — для всего каталога. Возвращает число изменённых товаров.
+    """
+    global _prices_valid_until
+    
+    now = datetime.utcnow()
+    promotions = get_promotion_snapshot(db)
     
-    # Если есть old_price — это уже скидка на товаре
-    if product.old_price and product.old_price > product.price:
-        discount_percent = int(((product.old_price - product.price) / product.old_price) * 100)
-        return product.price, discount_percent
+    stmt = select(Product)
+    if product_ids is not None:
+        stmt = stmt.where(col(Product.id).in_(list(product_ids)))
     
-    # Если передана сессия — ищем активные промоакции
-    if db:
-        all_promotions = get_active_promotions(db)
-        applicable = get_applicable_promotions(product, all_promotions)
-        best_promo = select_best_promotion(base_price, applicable)
+    products = db.exec(stmt).all()
+    
+    updated = 0
+    for product, (final_price, discount_percent) in zip(products, price_products(products, promotions)):
+        is_on_sale = discount_percent is not None
         
-        if best_promo:
-            final_price = calculate_discount(base_price, best_promo)
-            discount_percent = int(((base_price - final_price) / base_price) * 100)
-            return final_price.quantize(Decimal("0.01")), discount_percent
+        if (
+            product.final_price != final_price
+            or product.discount_percent != discount_percent
+            or product.is_on_sale != is_on_sale
+        ):
+            product.final_price = final_price
+            product.discount_percent = discount_percent
+            product.is_on_sale = is_on_sale
+            db.add(product)
+            updated += 1
+    
+    db.commit()
+    
+    if product_ids is None:
+        _prices_valid_until = next_promotion_boundary(db, now)
     
-    return base_price, None
+    return updated
+
+
+def invalidate_effective_prices() -> None:
+    """Пометить материализованные цены как устаревшие (пересчёт при следующем чтении)"""
+    global _prices_valid_until
+    _prices_valid_until = None
 
 
-def build_product_response(product: Product, db: Session) -> dict:
-    """Построить ответ продукта с вычисленными полями"""
-    final_price, discount_percent = apply_promotions(product, db)
+def ensure_effective_prices(db: Session) -> datetime:
+    """
+    Пересчитать цены каталога, если акция началась/закончилась с прошлого пересчёта.
+    Пока пересчёт идёт в другом потоке — ждёт его: читать цены до пересчёта
+    нельзя (по ним, например, строится индекс каталога).
+    Возвращает момент, до которого материализованные цены актуальны.
+    """
+    valid_until = _prices_valid_until
+    if valid_until is not None and datetime.utcnow() < valid_until:
+        return valid_until
     
-    # Найти primary image
-    primary_image = None
+    with _refresh_lock:
+        # Пока ждали блокировку, другой поток мог уже пересчитать
+        valid_until = _prices_valid_until
+        if valid_until is None or datetime.utcnow() >= valid_until:
+            refresh_effective_prices(db)
+            valid_until = _prices_valid_until
+    # Цены сбросили сразу после пересчёта — считаем их уже устаревшими
+    return valid_until or datetime.utcnow()
+
+
+def _primary_image(product: Product) -> Optional[str]:
+    """URL главного изображения (или первого)"""
     for img in product.images:
         if img.is_primary:
-            primary_image = img.url
-            break
-    if not primary_image and product.images:
-        primary_image = product.images[0].url
-    
-    return {
-        "id": product.id,
-        "name": product.name,
-        "slug": product.slug,
-        "brand": product.brand,
-        "price": float(product.price) if product.price else None,
-        "old_price": float(product.old_price) if product.old_price else None,
-        "final_price": float(final_price) if final_price else None,
-        "discount_percent": discount_percent,
-        "in_stock": product.in_stock,
-        "is_featured": product.is_featured,
-        "is_active": product.is_active,
-        "category_id": product.category_id,
-        "category_name": product.category.name if product.category else None,
-        "sku": product.sku,
-        "primary_image": primary_image,
-    }
-
-
-def build_product_detail_response(product: Product, db: Session) -> dict:
-    """Построить детальный ответ продукта"""
-    base = build_product_response(product, db)
-    
-    base.update({
-        "description": product.description,
-        "sku": product.sku,
-        "images": [
-            {
-                "id": img.id,
-                "url": img.url,
-                "alt": img.alt,
-                "is_primary": img.is_primary,
-                "sort_order": img.sort_order,
-            }
-            for img in sorted(product.images, key=lambda x: (not x.is_primary, x.sort_order))
-        ],
-        "category_name": product.category.name if product.category else None,
-        "is_active": product.is_active,
-    })
-    
-    return base
+            return img.url
+    return product.images[0].url if product.images else None
+
+
+def _images(product: Product) -> List[dict]:
+    return [
+        {
+            "id": img.id,
+            "url": img.url,
+            "alt": img.alt,
+            "is_primary": img.is_primary,
+            "sort_order": img.sort_order,
+        }
+        for img in sorted(product.images, key=lambda x: (not x.is_primary, x.sort_order))
+    ]
+
+
+# Поле ответа -> значение по (товар, (final_price, discount_percent)).
+# Атрибуты товара читаются только для запрошенных полей (sparse fieldsets)
+PRODUCT_CARD_FIELDS = {
+    "id": lambda p, price: p.id,
+    "name": lambda p, price: p.name,
+    "slug": lambda p, price: p.slug,
+    "brand": lambda p, price: p.brand,
+    "price": lambda p, price: float(p.price) if p.price else None,
+    "old_price": lambda p, price: float(p.old_price) if p.old_price else None,
+    "final_price": lambda p, price: float(price[0]) if price[0] else None,
+    "discount_percent": lambda p, price: price[1],
+    "in_stock": lambda p, price: p.in_stock,
+    "is_featured": lambda p, price: p.is_featured,
+    "is_active": lambda p, price: p.is_active,
+    "category_id": lambda p, price: p.category_id,
+    "category_name": lambda p, price: p.category.name if p.category else None,
+    "sku": lambda p, price: p.sku,
+    "primary_image": lambda p, price: _primary_image(p),
+}
+
+PRODUCT_DETAIL_FIELDS = {
+    **PRODUCT_CARD_FIELDS,
+    "description": lambda p, price: p.description,
+    "images": lambda p, price: _images(p),
+}
 
+# Поля, для которых нужен расчёт цены с акциями
+PRICED_FIELDS = {"final_price", "discount_percent"}
+
+
+def _build_response(product: Product, db: Session, promotions, fields, field_map: dict, price=None) -> dict:
+    names = list(field_map) if fields is None else [name for name in field_map if name in fields]
+    
+    if price is None and PRICED_FIELDS.intersection(names):
+        if promotions is not None:
+            price = price_with_promotions(product, promotions)
+        else:
+            price = apply_promotions(product, db)
+    price = price or (None, None)
+    
+    return {name: field_map[name](product, price) for name in names}
+
+
+def build_product_response(
+    product: Product,
+    db: Session,
+    promotions: Optional[Union[List[Promotion], PromotionSnapshot]] = None,
+    fields: Optional[Iterable[str]] = None,
+    price: Optional[Tuple[Decimal, Optional[int]]] = None,
+) -> dict:
+    """
+    Построить ответ продукта с вычисленными полями.
+    promotions — снимок (или список) активных акций для списков товаров,
+    fields — только эти поля ответа (None — все),
+    price — уже рассчитанные (final_price, discount_percent) (price_products).
+    """
+    return _build_response(product, db, promotions, fields, PRODUCT_CARD_FIELDS, price)
+
+
+def build_product_detail_response(
+    product: Product,
+    db: Session,
+    promotions: Optional[Union[List[Promotion], PromotionSnapshot]] = None,
+    fields: Optional[Iterable[str]] = None,
+    price: Optional[Tuple[Decimal, Optional[int]]] = None,
+) -> dict:
+    """Построить детальный ответ продукта"""
+    return _build_response(product, db, promotions, fields, PRODUCT_DETAIL_FIELDS, price)
@@ -0,0 +1,120 @@
+"""Загрузка карточек товаров фиксированным числом запросов."""
+import logging
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload, load_only
+from sqlmodel import Session, select, col
+from app.models.product import Product
+from app.services.pricing import (
+    PromotionSnapshot, get_promotion_snapshot, price_products,
+    build_product_response, build_product_detail_response, PRICED_FIELDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Товары + категории (JOIN), изображения (SELECT ... IN); активные акции —
+# из снимка в памяти (при его перестройке — ещё до четырёх запросов)
+CARD_QUERY_BUDGET = 6
+
+CARD_LOAD_OPTIONS = (
+    joinedload(Product.category),
+    selectinload(Product.images),
+)
+
+# Колонки товара для вычисляемых полей ответа (остальные поля — одноимённые колонки)
+FIELD_COLUMNS = {
+    "final_price": ("price", "old_price", "category_id"),
+    "discount_percent": ("price", "old_price", "category_id"),
+    "category_name": ("category_id",),
+    "primary_image": (),
+    "images": (),
+}
+
+# Связи, которые нужно подгрузить для поля
+FIELD_RELATIONS = {
+    "category_name": joinedload(Product.category),
+    "primary_image": selectinload(Product.images),
+    "images": selectinload(Product.images),
+}
+
+
+def _load_options(fields: Optional[Iterable[str]]) -> list:
+    """Опции загрузки: все колонки и связи или только нужные для fields"""
+    if fields is None:
+        return list(CARD_LOAD_OPTIONS)
+
+    columns = {"id"}
+    relations = {}
+    for name in fields:
+        columns.update(FIELD_COLUMNS.get(name, (name,)))
+        if name in FIELD_RELATIONS:
+            relations[name if name != "primary_image" else "images"] = FIELD_RELATIONS[name]
+    return [load_only(*(getattr(Product, column) for column in sorted(columns)))] + list(relations.values())
+
+
+@contextmanager
+def count_queries(db: Session) -> Iterator[List[int]]:
+    """Считать SQL-запросы сессии внутри блока: counter[0]"""
+    counter = [0]
+    connection = db.connection()
+
+    def on_execute(*args):
+        counter[0] += 1
+
+    event.listen(connection, "before_cursor_execute", on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(connection, "before_cursor_execute", on_execute)
+
+
+def load_product_cards(
+    db: Session,
+    product_ids: List[int],
+    detail: bool = False,
+    active_only: bool = False,
+    promotions: Optional[PromotionSnapshot] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[dict], int]:
+    """
+    Карточки товаров в порядке product_ids (отсутствующие пропускаются).
+    detail — полный ответ (описание и все изображения) вместо карточки,
+    active_only — пропускать неактивные товары, promotions — снимок активных
+    акций (один на несколько загрузок в рамках запроса),
+    fields — только эти поля ответа: загружаются только нужные колонки и связи.
+    Возвращает (карточки, число SQL-запросов).
+    """
+    if not product_ids:
+        return [], 0
+
+    build = build_product_detail_response if detail else build_product_response
+
+    stmt = select(Product).where(col(Product.id).in_(product_ids)).options(*_load_options(fields))
+    if active_only:
+        stmt = stmt.where(Product.is_active == True)
+
+    with count_queries(db) as counter:
+        products = db.exec(stmt).all()
+
+        # Цены всех товаров — одним проходом по снимку акций
+        prices = {}
+        if fields is None or PRICED_FIELDS.intersection(fields):
+            if promotions is None:
+                promotions = get_promotion_snapshot(db)
+            prices = dict(zip((p.id for p in products), price_products(products, promotions)))
+
+        by_id = {p.id: p for p in products}
+        cards = [
+            build(by_id[pid], db, promotions, fields, price=prices.get(pid, (None, None)))
+            for pid in product_ids if pid in by_id
+        ]
+
+    if counter[0] > CARD_QUERY_BUDGET:
+        logger.warning(
+            "Loaded %d product cards in %d queries (budget %d)", len(cards), counter[0], CARD_QUERY_BUDGET
+        )
+    else:
+        logger.debug("Loaded %d product cards in %d queries", len(cards), counter[0])
+
+    return cards, counter[0]
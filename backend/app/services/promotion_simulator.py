@@ -0,0 +1,133 @@
+"""«Что если»: оценка черновика акции на активном каталоге до включения."""
+from typing import Optional, List, Dict, Tuple, Hashable
+from sqlmodel import Session, select
+from app.models.product import Product
+from app.models.promotion import Promotion, PromotionScope
+from app.services import price_kernel
+from app.services.price_kernel import to_kopecks, from_kopecks
+from app.services.pricing import PromotionSnapshot, get_promotion_snapshot, parse_target_ids
+
+
+def _covers(promotion: Promotion, target_ids: set, product) -> bool:
+    """Акция по scope и целям относится к товару (без учёта других акций)"""
+    if promotion.scope == PromotionScope.ALL:
+        return True
+    if promotion.scope == PromotionScope.CATEGORY:
+        return product.category_id in target_ids
+    if promotion.scope == PromotionScope.PRODUCT:
+        return product.id in target_ids
+    return False
+
+
+class _Pricer:
+    """Цена и применённая акция товара по снимку — один расчёт на (группа, базовая цена)"""
+
+    def __init__(self, snapshot: PromotionSnapshot):
+        self.snapshot = snapshot
+        self._computed: Dict[Tuple[Hashable, int], Tuple[int, Optional[Promotion]]] = {}
+
+    def price(self, product, base_price: int) -> Tuple[int, Optional[Promotion]]:
+        group, terms = self.snapshot.group_terms(product)
+        key = (group, base_price)
+        result = self._computed.get(key)
+        if result is None:
+            price, _, index = price_kernel.final_price_with_term(base_price, None, terms)
+            winner = self.snapshot.group(product)[1][index] if index is not None else None
+            result = self._computed[key] = (price, winner)
+        return result
+
+
+def simulate_promotion(db: Session, draft: Promotion, limit: int = 100) -> dict:
+    """
+    Оценить черновик акции (Promotion без id) на активном каталоге.
+    Возвращает счётчики, первые limit затронутых товаров (по величине
+    снижения цены), изменение цен и выручки, а также взаимодействие
+    с действующими акциями по правилам select_best_promotion:
+    shadowed_promotions — акции, которые черновик вытеснит;
+    blocking_promotions — акции, которые перекроют черновик.
+    """
+    current = get_promotion_snapshot(db)
+    simulated = current.with_promotion(draft)
+    current_pricer = _Pricer(current)
+    simulated_pricer = _Pricer(simulated)
+    target_ids = set(parse_target_ids(draft.target_ids))
+
+    rows = db.exec(
+        select(
+            Product.id, Product.name, Product.slug, Product.category_id,
+            Product.price, Product.old_price, Product.sales_30d,
+        ).where(Product.is_active == True)
+    ).all()
+
+    targeted = applied = blocked_by_old_price = 0
+    price_delta = revenue_delta = 0
+    affected: List[tuple] = []
+    shadowed: Dict[int, list] = {}
+    blocking: Dict[int, list] = {}
+
+    for row in rows:
+        if not _covers(draft, target_ids, row):
+            continue
+        targeted += 1
+
+        base_price = to_kopecks(row.price)
+        old_price = to_kopecks(row.old_price)
+        if old_price and old_price > base_price:
+            # Скидка самого товара: акции к нему не применяются
+            blocked_by_old_price += 1
+            continue
+
+        current_price, current_winner = current_pricer.price(row, base_price)
+        simulated_price, simulated_winner = simulated_pricer.price(row, base_price)
+
+        if simulated_winner is draft:
+            applied += 1
+        elif simulated_winner is not None:
+            # Черновик проиграл: у акции уже scope, выше priority или больше выгода
+            blocking.setdefault(simulated_winner.id, [simulated_winner, 0])[1] += 1
+        if current_winner is not None and simulated_winner is not current_winner:
+            # Действующая акция перестаёт применяться (черновик выгоднее
+            # или отсёк её scope/priority)
+            shadowed.setdefault(current_winner.id, [current_winner, 0])[1] += 1
+
+        delta = simulated_price - current_price
+        if delta:
+            price_delta += delta
+            revenue_delta += delta * (row.sales_30d or 0)
+            affected.append((delta, row.id, row, current_price, simulated_price, current_winner))
+
+    affected.sort(key=lambda item: (item[0], item[1]))
+
+    return {
+        "catalog_size": len(rows),
+        "targeted": targeted,
+        "applied": applied,
+        "affected": len(affected),
+        "blocked_by_old_price": blocked_by_old_price,
+        "total_price_delta": from_kopecks(price_delta),
+        "revenue_delta_30d": from_kopecks(revenue_delta),
+        "shadowed_promotions": _promotion_counts(shadowed),
+        "blocking_promotions": _promotion_counts(blocking),
+        "products": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "slug": row.slug,
+                "price": from_kopecks(to_kopecks(row.price)),
+                "current_price": from_kopecks(current_price),
+                "simulated_price": from_kopecks(simulated_price),
+                "price_delta": from_kopecks(delta),
+                "current_promotion_id": current_winner.id if current_winner is not None else None,
+                "sales_30d": row.sales_30d or 0,
+            }
+            for delta, _, row, current_price, simulated_price, current_winner in affected[:limit]
+        ],
+    }
+
+
+def _promotion_counts(counts: Dict[int, list]) -> List[dict]:
+    """[{id, code, name, products}] по убыванию числа товаров"""
+    return [
+        {"id": promo.id, "code": promo.code, "name": promo.name, "products": products}
+        for promo, products in sorted(counts.values(), key=lambda item: (-item[1], item[0].id))
+    ]
@@ -0,0 +1,73 @@
+"""Нормализованные цели акций: таблица promotion_targets (акция, тип, id)."""
+from sqlalchemy import delete, union_all, true
+from sqlmodel import Session, select, col
+from app.models.product import Product
+from app.models.promotion import Promotion, PromotionScope, PromotionTarget
+from app.services.pricing import parse_target_ids
+
+TARGET_SCOPES = (PromotionScope.CATEGORY, PromotionScope.PRODUCT)
+
+
+def set_promotion_targets(db: Session, promotion: Promotion) -> None:
+    """Записать цели акции по её scope и target_ids (commit — у вызывающего кода)"""
+    db.exec(delete(PromotionTarget).where(PromotionTarget.promotion_id == promotion.id))
+    if promotion.scope not in TARGET_SCOPES:
+        return
+
+    for target_id in dict.fromkeys(parse_target_ids(promotion.target_ids)):
+        db.add(PromotionTarget(promotion_id=promotion.id, target_type=promotion.scope, target_id=target_id))
+
+
+def delete_promotion_targets(db: Session, promotion_id: int) -> None:
+    """Удалить цели акции (перед удалением самой акции)"""
+    db.exec(delete(PromotionTarget).where(PromotionTarget.promotion_id == promotion_id))
+
+
+def backfill_promotion_targets(db: Session) -> int:
+    """Заполнить цели акций, у которых их ещё нет, из target_ids (миграция)"""
+    with_targets = select(PromotionTarget.promotion_id).distinct()
+    promotions = db.exec(
+        select(Promotion).where(
+            col(Promotion.scope).in_(TARGET_SCOPES),
+            Promotion.target_ids != None,
+            col(Promotion.id).not_in(with_targets),
+        )
+    ).all()
+
+    for promotion in promotions:
+        set_promotion_targets(db, promotion)
+    db.commit()
+    return len(promotions)
+
+
+def _applicable_targets(promotion_ids=None):
+    """
+    SELECT (product_id, promotion_id) для акций с целями: по товару и по его
+    категории — две ветки UNION ALL, каждая по индексу (target_type, target_id).
+    """
+    by_product = (
+        select(Product.id.label("product_id"), PromotionTarget.promotion_id)
+        .join(PromotionTarget, PromotionTarget.target_id == Product.id)
+        .where(PromotionTarget.target_type == PromotionScope.PRODUCT)
+    )
+    by_category = (
+        select(Product.id.label("product_id"), PromotionTarget.promotion_id)
+        .join(PromotionTarget, PromotionTarget.target_id == Product.category_id)
+        .where(PromotionTarget.target_type == PromotionScope.CATEGORY)
+    )
+    if promotion_ids is not None:
+        by_product = by_product.where(col(PromotionTarget.promotion_id).in_(promotion_ids))
+        by_category = by_category.where(col(PromotionTarget.promotion_id).in_(promotion_ids))
+    return union_all(by_product, by_category)
+
+
+def promotion_products_condition(db: Session, promotion_id: int):
+    """SQL-условие на Product: акция promotion_id действует на товар (для WHERE листинга)"""
+    promotion = db.get(Promotion, promotion_id)
+    if promotion is None:
+        return Product.id == None
+    if promotion.scope == PromotionScope.ALL:
+        return true()
+
+    targets = _applicable_targets([promotion_id]).subquery()
+    return col(Product.id).in_(select(targets.c.product_id))
@@ -0,0 +1,126 @@
+"""Кэш сериализованных ответов публичного каталога по версии каталога (LRU + TTL)."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from app.core.config import settings
+from app.services.single_flight import SingleFlight
+
+
+class ResponseCache:
+    """LRU-кэш сериализованных ответов с TTL и проверкой версии"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (version, expires_at, body)
+        self._entries: "OrderedDict[Tuple, Tuple[int, float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple, version: int) -> Optional[bytes]:
+        """Тело ответа для ключа, если оно той же версии и не истекло"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: Tuple, version: int, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl_seconds, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+# Одинаковые параллельные промахи кэша ждут одно вычисление
+response_flight = SingleFlight(timeout=settings.SINGLE_FLIGHT_TIMEOUT_SECONDS)
+
+
+def request_cache_key(name: str, request: Request) -> Tuple:
+    """
+    Ключ кэша: имя эндпоинта, параметры пути и query-параметры.
+    Порядок параметров и пустые значения на ключ не влияют,
+    повторяющиеся параметры (category=a&category=b) сохраняются.
+    """
+    path_params = tuple(sorted(request.path_params.items()))
+    query_params = tuple(sorted(
+        (key, value) for key, value in request.query_params.multi_items() if value != ""
+    ))
+    return name, path_params, query_params
+
+
+_adapters: dict = {}
+
+
+def serialize_response(response_model: Any, content: Any) -> bytes:
+    """JSON по response_model — так же, как сериализует FastAPI"""
+    adapter = _adapters.get(response_model)
+    if adapter is None:
+        adapter = _adapters[response_model] = TypeAdapter(response_model)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+def cached_json_response(
+    name: str,
+    request: Request,
+    response: Response,
+    version: int,
+    response_model: Any,
+    compute: Callable[[], Any],
+    key_func: Callable[[str, Request], Hashable] = request_cache_key,
+) -> Response:
+    """
+    Ответ из кэша или результат compute(), сериализованный по response_model.
+    key_func(name, request) — ключ кэша и single-flight.
+    Заголовки, выставленные зависимостями (ETag, Last-Modified), сохраняются.
+    """
+    key = key_func(name, request)
+    body = response_cache.get(key, version) if settings.RESPONSE_CACHE_ENABLED else None
+
+    if body is None:
+        def build() -> bytes:
+            built = serialize_response(response_model, compute())
+            if settings.RESPONSE_CACHE_ENABLED:
+                response_cache.set(key, version, built)
+            return built
+
+        if settings.SINGLE_FLIGHT_ENABLED:
+            body = response_flight.do((key, version), build)
+        else:
+            body = build()
+
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
@@ -0,0 +1,172 @@
+"""Счётчики продаж товаров за скользящие окна 7 и 30 дней для sort=popular/trending."""
+from collections import Counter
+from datetime import datetime, date, timedelta
+from typing import Optional, Dict
+import logging
+import threading
+from sqlalchemy import delete, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, select, col, or_
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.product import Product, ProductSales
+from app.services.catalog_index import patch_catalog_sales
+from app.services.catalog_version import bump_popularity_version
+
+logger = logging.getLogger(__name__)
+
+# Колонка товара -> длина окна в днях (включая сегодня)
+SALES_WINDOWS = {
+    "sales_7d": 7,
+    "sales_30d": 30,
+}
+
+# Дневные счётчики старше самого длинного окна не нужны
+RETENTION_DAYS = max(SALES_WINDOWS.values())
+
+# Сортировки каталога, зависящие от счётчиков
+SALES_SORTS = ("popular", "trending")
+
+EXCLUDED_ORDER_STATUSES = (OrderStatus.CANCELLED, OrderStatus.REFUNDED)
+
+# День, для которого материализованы окна; None — ещё не пересчитывались в процессе
+_windows_day: Optional[date] = None
+_refresh_lock = threading.Lock()
+
+
+def counts_as_sale(status: OrderStatus) -> bool:
+    """Учитывается ли заказ с таким статусом в продажах"""
+    return status not in EXCLUDED_ORDER_STATUSES
+
+
+def _in_window(day: date, today: date, days: int) -> bool:
+    return 0 <= (today - day).days < days
+
+
+def _publish(sales: Dict[int, Dict[str, int]]) -> None:
+    """Изменённые счётчики — в индекс каталога; новый порядок — новая версия популярности"""
+    if sales and patch_catalog_sales(sales):
+        bump_popularity_version()
+
+
+def record_order_sales(db: Session, order: Order, sign: int = 1) -> None:
+    """
+    Учесть (sign=1) или снять (sign=-1) проданные штуки заказа.
+    Вызывается после commit заказа: при создании и при смене статуса
+    между учитываемым и отменённым/возвращённым. Счётчики меняются атомарно
+    в SQL (параллельные заказы не теряют обновлений); ошибка логируется —
+    заказ уже сохранён, и запрос из-за счётчиков не падает.
+    """
+    day = order.created_at.date()
+    today = datetime.utcnow().date()
+    if (today - day).days >= RETENTION_DAYS:
+        return
+
+    quantities = Counter()
+    for item in order.items:
+        quantities[item.product_id] += item.quantity
+    if not quantities:
+        return
+
+    columns = [column for column, days in SALES_WINDOWS.items() if _in_window(day, today, days)]
+    deltas = [{"product_id": product_id, "delta": sign * quantity} for product_id, quantity in quantities.items()]
+    try:
+        db.exec(
+            text(
+                "INSERT INTO product_sales (product_id, day, quantity) VALUES (:product_id, :day, max(:delta, 0)) "
+                "ON CONFLICT (product_id, day) DO UPDATE SET quantity = max(quantity + :delta, 0)"
+            ),
+            params=[{**delta, "day": day.isoformat()} for delta in deltas],
+        )
+        if columns:
+            assignments = ", ".join(f"{column} = max({column} + :delta, 0)" for column in columns)
+            db.exec(text(f"UPDATE products SET {assignments} WHERE id = :product_id"), params=deltas)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        logger.exception("Failed to record sales of order %s", order.id)
+        return
+
+    rows = db.exec(
+        select(Product.id, *[getattr(Product, column) for column in SALES_WINDOWS])
+        .where(col(Product.id).in_(list(quantities)))
+    ).all()
+    _publish({row[0]: dict(zip(SALES_WINDOWS, row[1:])) for row in rows})
+
+
+def refresh_sales_windows(db: Session) -> int:
+    """
+    Пересчитать sales_7d / sales_30d из дневных счётчиков на сегодня
+    и удалить счётчики старше RETENTION_DAYS. Возвращает число изменённых товаров.
+    """
+    global _windows_day
+
+    today = datetime.utcnow().date()
+    totals = {column: Counter() for column in SALES_WINDOWS}
+    rows = db.exec(
+        select(ProductSales).where(ProductSales.day > today - timedelta(days=RETENTION_DAYS))
+    ).all()
+    for row in rows:
+        for column, days in SALES_WINDOWS.items():
+            if _in_window(row.day, today, days):
+                totals[column][row.product_id] += row.quantity
+
+    # Товары с продажами в окне или с ненулевыми счётчиками с прошлого пересчёта
+    product_ids = set().union(*totals.values())
+    stmt = select(Product).where(or_(
+        col(Product.id).in_(list(product_ids)),
+        *[getattr(Product, column) != 0 for column in SALES_WINDOWS],
+    ))
+
+    sales = {}
+    for product in db.exec(stmt).all():
+        values = {column: totals[column][product.id] for column in SALES_WINDOWS}
+        if any(getattr(product, column) != value for column, value in values.items()):
+            for column, value in values.items():
+                setattr(product, column, value)
+            db.add(product)
+            sales[product.id] = values
+
+    db.exec(delete(ProductSales).where(ProductSales.day <= today - timedelta(days=RETENTION_DAYS)))
+    db.commit()
+
+    _windows_day = today
+    _publish(sales)
+    return len(sales)
+
+
+def ensure_sales_windows(db: Session) -> None:
+    """Сдвинуть окна продаж, если с прошлого пересчёта наступил новый день"""
+    if _windows_day == datetime.utcnow().date():
+        return
+
+    # Пересчёт уже идёт в другом потоке — отдаём текущие данные
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        refresh_sales_windows(db)
+    finally:
+        _refresh_lock.release()
+
+
+def rebuild_sales_counters(db: Session) -> None:
+    """Заново заполнить дневные счётчики по заказам за RETENTION_DAYS (миграции)"""
+    since = datetime.utcnow().date() - timedelta(days=RETENTION_DAYS - 1)
+    rows = db.exec(
+        select(OrderItem.product_id, Order.created_at, OrderItem.quantity)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(
+            Order.created_at >= datetime.combine(since, datetime.min.time()),
+            col(Order.status).not_in(EXCLUDED_ORDER_STATUSES),
+        )
+    ).all()
+
+    quantities = Counter()
+    for product_id, created_at, quantity in rows:
+        quantities[(product_id, created_at.date())] += quantity
+
+    db.exec(delete(ProductSales))
+    for (product_id, day), quantity in quantities.items():
+        db.add(ProductSales(product_id=product_id, day=day, quantity=quantity))
+    db.commit()
+
+    refresh_sales_windows(db)
@@ -0,0 +1,202 @@
+"""Полнотекстовый поиск товаров на SQLite FTS5 по нормализованному тексту."""
+import re
+import unicodedata
+from typing import Optional, Iterable, List
+from sqlalchemy import text, literal_column, table, column
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select, col
+from app.models.product import Product
+
+FTS_TABLE = "products_fts"
+
+# Веса колонок для bm25: name > brand > description
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_fts = table(FTS_TABLE, column("rowid"))
+_fts_match = literal_column(FTS_TABLE)
+_fts_rank = literal_column(f"bm25({FTS_TABLE}, {', '.join(str(w) for w in BM25_WEIGHTS)})")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Эквивалентные буквы (укр./рус.) и буквы, которые при поиске не различаем
+_LETTER_FOLDS = str.maketrans({
+    "ё": "е", "э": "е", "є": "е",
+    "і": "и", "ї": "и", "ы": "и", "й": "и",
+    "ґ": "г",
+    "ъ": None, "ь": None,
+    "'": None, "ʼ": None, "’": None, "`": None,
+})
+
+# Транслитерация кириллицы в латиницу (после _LETTER_FOLDS)
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh",
+    "з": "z", "и": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h",
+    "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch", "ю": "iu", "я": "ia",
+})
+
+# Фонетическое сближение латинских написаний (порядок важен)
+_LATIN_FOLDS = (
+    ("ph", "f"), ("ck", "k"), ("c", "k"), ("q", "k"), ("x", "ks"),
+    ("w", "v"), ("y", "i"), ("ee", "i"), ("oo", "u"),
+)
+_REPEATED_RE = re.compile(r"(.)\1+")
+
+# Префикс может оборвать сочетание из _LATIN_FOLDS на первой букве:
+# «shampo» — начало «shampoo» (-> shampu), поэтому ищется и «shampu»
+_PREFIX_TAILS = (("o", "u"), ("e", "i"), ("p", "f"))
+
+# Написания одного слова, которые правила не сводят к одному ключу
+# (беглые гласные транслитерации). В индексы пишутся все варианты,
+# запрос не меняется — префиксный поиск работает по любому написанию
+_SPELLING_GROUPS = (
+    ("kosrks", "kosriks"),  # cosrx / косрикс
+)
+_SPELLING_VARIANTS = {
+    word: tuple(other for other in group if other != word)
+    for group in _SPELLING_GROUPS
+    for word in group
+}
+
+
+def normalize_search_text(value: Optional[str]) -> str:
+    """
+    Нормализованный поисковый ключ:
+    1. NFKC + casefold (в т.ч. для кириллицы);
+    2. ё/э/є → е, і/ї/ы/й → и, ґ → г, без ъ/ь и апострофов;
+    3. транслитерация кириллицы в латиницу;
+    4. ph → f, c/ck/q → k, x → ks, w → v, y → i, ee → i, oo → u;
+    5. схлопывание повторяющихся букв (innisfree → inisfri).
+    Слова разделяются одним пробелом.
+    """
+    if not value:
+        return ""
+    
+    value = unicodedata.normalize("NFKC", value).casefold()
+    value = value.translate(_LETTER_FOLDS).translate(_TRANSLIT)
+    
+    tokens = []
+    for token in _TOKEN_RE.findall(value):
+        for source, target in _LATIN_FOLDS:
+            token = token.replace(source, target)
+        tokens.append(_REPEATED_RE.sub(r"\1", token))
+    
+    return " ".join(tokens)
+
+
+def prefix_variants(token: str) -> List[str]:
+    """Нормализованный префикс слова и ключи, с которых может начинаться его продолжение"""
+    variants = [token]
+    for tail, folded in _PREFIX_TAILS:
+        if token.endswith(tail):
+            variants.append(token[:-len(tail)] + folded)
+    return variants
+
+
+def spelling_variants(token: str) -> tuple:
+    """Другие написания нормализованного слова (для индексов, не для запроса)"""
+    return _SPELLING_VARIANTS.get(token, ())
+
+
+def index_search_text(value: Optional[str]) -> str:
+    """Текст для FTS-индекса: нормализованный текст и другие написания его слов"""
+    text = normalize_search_text(value)
+    extra = [variant for token in text.split() for variant in spelling_variants(token)]
+    return " ".join([text, *extra]) if extra else text
+
+
+def product_search_key(product: Product) -> str:
+    """Ключ товара для поиска по названию и бренду"""
+    return normalize_search_text(f"{product.name or ''} {product.brand or ''}")
+
+
+def create_search_index(engine: Engine) -> None:
+    """Создать FTS5-таблицу (create_all виртуальные таблицы не создаёт)"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(name, brand, description, tokenize='unicode61 remove_diacritics 2')"
+        ))
+
+
+def _document(product: Product) -> dict:
+    """Строка FTS-индекса: нормализованные поля товара"""
+    return {
+        "id": product.id,
+        "name": index_search_text(product.name),
+        "brand": index_search_text(product.brand),
+        "description": index_search_text(product.description),
+    }
+
+
+def index_products(db: Session, product_ids: Iterable[int]) -> None:
+    """Переиндексировать товары; удалённые из products убираются из индекса"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+
+    products = db.exec(select(Product).where(col(Product.id).in_(product_ids))).all()
+
+    db.exec(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"),
+        params=[{"id": product_id} for product_id in product_ids],
+    )
+    if products:
+        db.exec(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, name, brand, description) VALUES (:id, :name, :brand, :description)"),
+            params=[_document(p) for p in products],
+        )
+    db.commit()
+
+
+def rebuild_search_index(db: Session) -> None:
+    """Полностью перестроить индекс по всем товарам"""
+    db.exec(text(f"DELETE FROM {FTS_TABLE}"))
+    products = db.exec(select(Product)).all()
+    if products:
+        db.exec(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, name, brand, description) VALUES (:id, :name, :brand, :description)"),
+            params=[_document(p) for p in products],
+        )
+    db.commit()
+
+
+def build_match_query(q: str, columns: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Строка запроса FTS5 по нормализованному q: каждое слово — префиксный терм
+    (с вариантами prefix_variants через OR), слова через AND. Кавычки
+    экранируют спецсимволы синтаксиса MATCH.
+    columns — искать только в этих колонках (фильтр {name brand}: ...).
+    """
+    tokens = normalize_search_text(q).split()
+    if not tokens:
+        return None
+    terms = []
+    for token in tokens:
+        variants = [f'"{variant}"*' for variant in prefix_variants(token)]
+        terms.append(variants[0] if len(variants) == 1 else f"({' OR '.join(variants)})")
+    query = " ".join(terms)
+    if columns:
+        return f"{{{' '.join(columns)}}} : ({query})"
+    return query
+
+
+def search_condition(match: str):
+    """Условие WHERE: товар находится полнотекстовым поиском"""
+    return col(Product.id).in_(
+        select(_fts.c.rowid).where(_fts_match.op("MATCH")(match))
+    )
+
+
+def search_product_ids(db: Session, match: str) -> set:
+    """id товаров, найденных полнотекстовым поиском"""
+    return set(db.exec(select(_fts.c.rowid).where(_fts_match.op("MATCH")(match))).all())
+
+
+def search_rank_subquery(match: str):
+    """Подзапрос (product_id, rank) для сортировки по релевантности (меньше — лучше)"""
+    return (
+        select(_fts.c.rowid.label("product_id"), _fts_rank.label("rank"))
+        .where(_fts_match.op("MATCH")(match))
+        .subquery("search_rank")
+    )
@@ -0,0 +1,296 @@
+"""Похожие товары по содержимому: косинус разреженных векторов признаков, TOP_K соседей на товар."""
+from collections import Counter
+from datetime import datetime, timedelta
+from math import floor, log, sqrt
+from typing import Optional, Iterable, List, Dict, Set, Tuple
+import logging
+import threading
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select, col
+from app.models.product import Product
+from app.services.catalog_version import bump_catalog_version
+from app.services.search import normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+# Сколько соседей хранить для каждого товара
+TOP_K = 20
+
+REBUILD_INTERVAL = timedelta(hours=6)
+
+# Веса групп признаков
+CATEGORY_WEIGHT = 3.0
+BRAND_WEIGHT = 2.0
+PRICE_BAND_WEIGHT = 1.5
+NAME_TOKEN_WEIGHT = 1.0
+DESCRIPTION_TOKEN_WEIGHT = 0.3
+
+# Соседние ценовые полосы отличаются в PRICE_BAND_RATIO раз
+PRICE_BAND_RATIO = 1.5
+
+# Слова короче — не признаки (союзы, предлоги, единицы измерения)
+MIN_TOKEN_LENGTH = 3
+
+# Признак, общий для большего числа товаров, не порождает кандидатов
+MAX_POSTINGS = 100
+
+# Сколько кандидатов ранжировать по полному косинусу
+CANDIDATES = 3 * TOP_K
+
+
+def _tokens(text: Optional[str]) -> Set[str]:
+    return {
+        token for token in normalize_search_text(text).split()
+        if len(token) >= MIN_TOKEN_LENGTH and not token.isdigit()
+    }
+
+
+def _price_band(product: Product) -> Optional[int]:
+    if not product.price or product.price <= 0:
+        return None
+    return floor(log(float(product.price)) / log(PRICE_BAND_RATIO))
+
+
+class SimilarIndex:
+    """Векторы признаков активных товаров и top-k соседей каждого"""
+
+    def __init__(self, products: List[Product]):
+        self.built_at = datetime.utcnow()
+        self._lock = threading.Lock()
+        self._vectors: Dict[int, Dict[str, float]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        # Документная частота слов (для IDF)
+        self._df = Counter()
+        self._size = 0
+        # product_id -> [(близость, id)] по убыванию; и обратные ссылки
+        self._top: Dict[int, List[Tuple[float, int]]] = {}
+        self._referrers: Dict[int, Set[int]] = {}
+
+        for product in products:
+            self._df.update(self._token_features(product))
+            self._size += 1
+        for product in products:
+            self._set_vector(product)
+        for product_id in self._vectors:
+            self._set_top(product_id, self._rank(product_id))
+
+    # === Запрос ===
+
+    def neighbours(self, product_id: int) -> List[int]:
+        """Похожие товары по убыванию близости"""
+        return [other for _, other in self._top.get(product_id, [])]
+
+    # === Изменения ===
+
+    def upsert(self, product: Product) -> None:
+        with self._lock:
+            affected = self._remove(product.id)
+            if product.is_active:
+                self._add(product)
+            for other in affected:
+                if other in self._vectors:
+                    self._set_top(other, self._rank(other))
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            for other in self._remove(product_id):
+                if other in self._vectors:
+                    self._set_top(other, self._rank(other))
+
+    def _add(self, product: Product) -> None:
+        self._df.update(self._token_features(product))
+        self._size += 1
+        self._set_vector(product)
+
+        scores = self._candidate_scores(product.id)
+        self._set_top(product.id, self._best(scores))
+        # Близость симметрична — новый товар может войти в списки кандидатов
+        for other, score in scores.items():
+            top = self._top.get(other, [])
+            if len(top) < TOP_K or (-score, product.id) < (-top[-1][0], top[-1][1]):
+                self._set_top(other, self._best({**{pid: s for s, pid in top}, product.id: score}))
+
+    def _remove(self, product_id: int) -> Set[int]:
+        """Убрать товар; возвращает товары, в чьих списках он был"""
+        vector = self._vectors.pop(product_id, None)
+        if vector is None:
+            return set()
+
+        self._df.subtract(feature for feature in vector if feature.startswith("t:"))
+        self._size -= 1
+        for feature in vector:
+            postings = self._postings.get(feature)
+            if postings is not None:
+                postings.discard(product_id)
+                if not postings:
+                    del self._postings[feature]
+
+        self._set_top(product_id, [])
+        del self._top[product_id]
+        return self._referrers.pop(product_id, set())
+
+    # === Векторы и ранжирование ===
+
+    @staticmethod
+    def _token_features(product: Product) -> Set[str]:
+        return {f"t:{token}" for token in _tokens(product.name) | _tokens(product.description)}
+
+    def _set_vector(self, product: Product) -> None:
+        vector: Dict[str, float] = {}
+        if product.category_id:
+            vector[f"c:{product.category_id}"] = CATEGORY_WEIGHT
+        if product.brand:
+            vector[f"b:{normalize_search_text(product.brand)}"] = BRAND_WEIGHT
+        band = _price_band(product)
+        if band is not None:
+            vector[f"p:{band}"] = PRICE_BAND_WEIGHT
+            vector[f"p:{band - 1}"] = PRICE_BAND_WEIGHT / 2
+            vector[f"p:{band + 1}"] = PRICE_BAND_WEIGHT / 2
+
+        name_tokens = _tokens(product.name)
+        for token in name_tokens | _tokens(product.description):
+            feature = f"t:{token}"
+            idf = log(1 + self._size / max(self._df[feature], 1))
+            weight = NAME_TOKEN_WEIGHT if token in name_tokens else DESCRIPTION_TOKEN_WEIGHT
+            vector[feature] = weight * idf
+
+        norm = sqrt(sum(w * w for w in vector.values())) or 1.0
+        self._vectors[product.id] = {feature: w / norm for feature, w in vector.items()}
+        for feature in vector:
+            self._postings.setdefault(feature, set()).add(product.id)
+
+    def _candidate_scores(self, product_id: int) -> Dict[int, float]:
+        """
+        Косинусная близость товара к кандидатам: товарам с общими редкими
+        признаками (лучшие CANDIDATES по частичной сумме), при нехватке —
+        товарам плотных признаков по убыванию веса признака.
+        """
+        vector = self._vectors[product_id]
+        partial = Counter()
+        dense = []
+        for feature, weight in vector.items():
+            postings = self._postings.get(feature, ())
+            if len(postings) > MAX_POSTINGS:
+                dense.append((weight, feature))
+                continue
+            for other in postings:
+                if other != product_id:
+                    partial[other] += weight * self._vectors[other][feature]
+
+        candidates = [other for other, _ in partial.most_common(CANDIDATES)]
+        if len(candidates) < CANDIDATES:
+            seen = set(candidates)
+            seen.add(product_id)
+            for _, feature in sorted(dense, reverse=True):
+                for other in self._postings[feature]:
+                    if other not in seen:
+                        candidates.append(other)
+                        seen.add(other)
+                        if len(candidates) >= CANDIDATES:
+                            break
+                if len(candidates) >= CANDIDATES:
+                    break
+
+        # Вклад редких признаков уже в partial — досчитываем плотные
+        vectors = self._vectors
+        return {
+            other: partial[other] + sum(weight * vectors[other].get(feature, 0.0) for weight, feature in dense)
+            for other in candidates
+        }
+
+    def _rank(self, product_id: int) -> List[Tuple[float, int]]:
+        return self._best(self._candidate_scores(product_id))
+
+    @staticmethod
+    def _best(scores: Dict[int, float]) -> List[Tuple[float, int]]:
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:TOP_K]
+        return [(score, other) for other, score in ranked]
+
+    def _set_top(self, product_id: int, top: List[Tuple[float, int]]) -> None:
+        for _, other in self._top.get(product_id, []):
+            referrers = self._referrers.get(other)
+            if referrers is not None:
+                referrers.discard(product_id)
+        self._top[product_id] = top
+        for _, other in top:
+            self._referrers.setdefault(other, set()).add(product_id)
+
+
+# === Глобальный индекс процесса ===
+
+_index: Optional[SimilarIndex] = None
+_index_lock = threading.Lock()
+# Товары, изменённые во время фоновой перестройки; None — перестройка не идёт
+_pending: Optional[Set[int]] = None
+# Пока индекс не построен, соседей нет
+_EMPTY_INDEX = SimilarIndex([])
+
+
+def get_similar_index(db: Session) -> SimilarIndex:
+    """
+    Текущий индекс. Перестройка (первая, после сброса и раз в REBUILD_INTERVAL)
+    запускается в фоне; пока она идёт — прежний индекс или пустой.
+    """
+    index = _index
+    if index is None or datetime.utcnow() - index.built_at >= REBUILD_INTERVAL:
+        start_similar_index_build(db.get_bind())
+    return index if index is not None else _EMPTY_INDEX
+
+
+def start_similar_index_build(engine: Engine) -> None:
+    """Запустить перестройку индекса в фоновом потоке (если ещё не идёт)"""
+    global _pending
+    with _index_lock:
+        if _pending is not None:
+            return
+        _pending = set()
+    threading.Thread(target=_build_similar_index, args=(engine,), name="similar-index", daemon=True).start()
+
+
+def _build_similar_index(engine: Engine) -> None:
+    global _index, _pending
+    try:
+        with Session(engine) as db:
+            index = SimilarIndex(db.exec(select(Product).where(Product.is_active == True)).all())
+            with _index_lock:
+                first = _index is None
+                _index = index
+                changed, _pending = _pending, None
+            # Изменения, записанные во время построения, могли не попасть в выборку
+            if changed:
+                patch_similar_index(db, changed)
+        if first:
+            # Ответы, посчитанные без индекса, не должны остаться в кэше
+            bump_catalog_version()
+    except Exception:
+        logger.exception("Similar products index build failed")
+    finally:
+        with _index_lock:
+            _pending = None
+
+
+def invalidate_similar_index() -> None:
+    """Сбросить индекс — перестроится в фоне при следующем запросе"""
+    global _index
+    _index = None
+
+
+def patch_similar_index(db: Session, product_ids: Iterable[int]) -> None:
+    """Обновить векторы и соседей изменённых/удалённых товаров"""
+    product_ids = list(product_ids)
+    with _index_lock:
+        if _pending is not None:
+            _pending.update(product_ids)
+
+    index = _index
+    if index is None:
+        return
+
+    products = db.exec(select(Product).where(col(Product.id).in_(product_ids))).all()
+    found = {p.id for p in products}
+
+    for product in products:
+        index.upsert(product)
+    for product_id in product_ids:
+        if product_id not in found:
+            index.remove(product_id)
@@ -0,0 +1,268 @@
+"""Подсказки поиска из in-memory префиксного индекса товаров, брендов и категорий."""
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Iterable, List, Tuple, Dict, Set
+import threading
+from sqlmodel import Session, select, col, func
+from app.models.product import Product
+from app.models.category import Category
+from app.models.order import Order, OrderItem, OrderStatus
+from app.services import pricing
+from app.services.search import normalize_search_text, prefix_variants, spelling_variants
+
+# Максимальное число подсказок на один префикс
+MAX_SUGGESTIONS = 20
+
+# Сколько префиксов держать в кэше результатов (LRU)
+MAX_CACHED_PREFIXES = 2048
+
+FEATURED_WEIGHT = 5
+
+REBUILD_INTERVAL = timedelta(hours=1)
+
+_EXCLUDED_ORDER_STATUSES = (OrderStatus.CANCELLED, OrderStatus.REFUNDED)
+
+
+def _suffix_keys(text: str) -> List[str]:
+    """Ключи для префиксного поиска с начала каждого слова (и с другими написаниями слов)"""
+    tokens = normalize_search_text(text).split()
+    keys = [" ".join(tokens[i:]) for i in range(len(tokens))]
+    for position, token in enumerate(tokens):
+        for variant in spelling_variants(token):
+            spelled = tokens[:position] + [variant] + tokens[position + 1:]
+            keys.extend(" ".join(spelled[i:]) for i in range(position + 1))
+    return keys
+
+
+class SuggestIndex:
+    """Префиксный индекс подсказок: товары, бренды, категории"""
+
+    def __init__(
+        self,
+        products: List[Product],
+        categories: List[Category],
+        sold: Dict[int, int],
+        valid_until: datetime = datetime.max,
+    ):
+        self.built_at = datetime.utcnow()
+        # Цены в подсказках актуальны до границы акции, популярность — REBUILD_INTERVAL
+        self.valid_until = min(valid_until, self.built_at + REBUILD_INTERVAL)
+        self._lock = threading.Lock()
+        self._sold = sold
+        # (kind, id) -> подсказка и её вес
+        self._entries: Dict[Tuple, dict] = {}
+        self._weights: Dict[Tuple, float] = {}
+        self._entry_keys: Dict[Tuple, List[str]] = {}
+        # Отсортированный массив (ключ, entry)
+        self._keys: List[Tuple[str, Tuple]] = []
+        self._brand_products: Dict[str, Set[int]] = {}
+        self._product_brand: Dict[int, str] = {}
+        # Результаты по префиксу (LRU; сбрасываются при любом изменении)
+        self._top: "OrderedDict[str, List[Tuple]]" = OrderedDict()
+
+        # Число товаров категорий — одним проходом по товарам
+        category_counts = Counter(p.category_id for p in products)
+        for category in categories:
+            self._set_entry(
+                ("category", category.id),
+                {"type": "category", "id": category.id, "label": category.name, "slug": category.slug},
+                weight=category_counts[category.id],
+                keys=_suffix_keys(category.name),
+            )
+        for product in products:
+            self._upsert_product(product)
+        self._keys.sort()
+
+    # === Запрос ===
+
+    def suggest(self, q: str, limit: int = 10) -> List[dict]:
+        """Лучшие по весу подсказки для префикса q"""
+        prefix = normalize_search_text(q)
+        if not prefix:
+            return []
+
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None:
+                top = self._collect(prefix)
+                if top:
+                    self._top[prefix] = top
+                    if len(self._top) > MAX_CACHED_PREFIXES:
+                        self._top.popitem(last=False)
+            else:
+                self._top.move_to_end(prefix)
+            return [self._entries[entry] for entry in top[:limit]]
+
+    def _collect(self, prefix: str) -> List[Tuple]:
+        found = set()
+        # Последнее слово — префикс: ищутся и его варианты (search.prefix_variants)
+        head, _, last = prefix.rpartition(" ")
+        for variant in prefix_variants(last):
+            variant = f"{head} {variant}" if head else variant
+            start = bisect_left(self._keys, (variant,))
+            for key, entry in self._keys[start:]:
+                if not key.startswith(variant):
+                    break
+                found.add(entry)
+        ranked = sorted(found, key=lambda e: (-self._weights[e], self._entries[e]["label"]))
+        return ranked[:MAX_SUGGESTIONS]
+
+    # === Изменения ===
+
+    def upsert_product(self, product: Product) -> None:
+        with self._lock:
+            self._upsert_product(product, keep_sorted=True)
+            self._top.clear()
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            self._remove_product(product_id)
+            self._top.clear()
+
+    def _upsert_product(self, product: Product, keep_sorted: bool = False) -> None:
+        self._remove_product(product.id)
+        if not product.is_active:
+            return
+
+        weight = self._sold.get(product.id, 0) + (FEATURED_WEIGHT if product.is_featured else 0)
+        self._set_entry(
+            ("product", product.id),
+            {
+                "type": "product",
+                "id": product.id,
+                "label": product.name,
+                "slug": product.slug,
+                "brand": product.brand,
+                "final_price": product.final_price,
+            },
+            weight=weight,
+            keys=_suffix_keys(f"{product.name} {product.brand or ''}"),
+            keep_sorted=keep_sorted,
+        )
+
+        if product.brand:
+            self._product_brand[product.id] = product.brand
+            self._brand_products.setdefault(product.brand, set()).add(product.id)
+            self._update_brand(product.brand, keep_sorted)
+
+    def _remove_product(self, product_id: int) -> None:
+        self._remove_entry(("product", product_id))
+        brand = self._product_brand.pop(product_id, None)
+        if brand is not None:
+            self._brand_products[brand].discard(product_id)
+            self._update_brand(brand, keep_sorted=True)
+
+    def _update_brand(self, brand: str, keep_sorted: bool) -> None:
+        members = self._brand_products.get(brand)
+        entry = ("brand", brand)
+        if not members:
+            self._brand_products.pop(brand, None)
+            self._remove_entry(entry)
+            return
+
+        weight = len(members) + sum(self._weights[("product", pid)] for pid in members)
+        if entry in self._entries:
+            self._weights[entry] = weight
+            return
+        self._set_entry(
+            entry,
+            {"type": "brand", "label": brand},
+            weight=weight,
+            keys=_suffix_keys(brand),
+            keep_sorted=keep_sorted,
+        )
+
+    def _set_entry(self, entry: Tuple, value: dict, weight: float, keys: List[str], keep_sorted: bool = False) -> None:
+        self._entries[entry] = value
+        self._weights[entry] = weight
+        self._entry_keys[entry] = keys
+        for key in keys:
+            if keep_sorted:
+                insort(self._keys, (key, entry))
+            else:
+                self._keys.append((key, entry))
+
+    def _remove_entry(self, entry: Tuple) -> None:
+        if entry not in self._entries:
+            return
+        for key in self._entry_keys.pop(entry):
+            position = bisect_left(self._keys, (key, entry))
+            if position < len(self._keys) and self._keys[position] == (key, entry):
+                del self._keys[position]
+        del self._entries[entry]
+        del self._weights[entry]
+
+
+# === Глобальный индекс процесса ===
+
+_index: Optional[SuggestIndex] = None
+# Поколение индекса: сброс или патч во время построения не даёт сохранить устаревший индекс
+_generation = 0
+# _index_lock — одно построение за раз, _state_lock — замена _index и _generation
+_index_lock = threading.Lock()
+_state_lock = threading.Lock()
+
+
+def build_suggest_index(db: Session) -> SuggestIndex:
+    """Построить индекс по активным товарам и категориям"""
+    # Цены товаров — материализованные: сначала пересчёт, если прошла граница акции
+    valid_until = pricing.ensure_effective_prices(db)
+    products = db.exec(select(Product).where(Product.is_active == True)).all()
+    categories = db.exec(select(Category).where(Category.is_active == True)).all()
+    sold = dict(db.exec(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(col(Order.status).not_in(_EXCLUDED_ORDER_STATUSES))
+        .group_by(OrderItem.product_id)
+    ).all())
+    return SuggestIndex(products, categories, sold, valid_until)
+
+
+def get_suggest_index(db: Session) -> SuggestIndex:
+    """Актуальный индекс (перестраивается после сброса, на границе акции и раз в REBUILD_INTERVAL)"""
+    global _index
+
+    index = _index
+    if index is not None and datetime.utcnow() < index.valid_until:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is None or datetime.utcnow() >= index.valid_until:
+            generation = _generation
+            index = build_suggest_index(db)
+            with _state_lock:
+                # Запись во время построения — не сохраняем (см. catalog_index)
+                if generation == _generation:
+                    _index = index
+    return index
+
+
+def invalidate_suggest_index() -> None:
+    """Сбросить индекс — перестроится при следующем запросе"""
+    global _index, _generation
+    with _state_lock:
+        _generation += 1
+        _index = None
+
+
+def patch_suggest_index(db: Session, product_ids: Iterable[int]) -> None:
+    """Обновить подсказки изменённых/удалённых товаров"""
+    global _generation
+    with _state_lock:
+        # Идущее построение могло прочитать товары до записи — не сохранится
+        _generation += 1
+        index = _index
+    if index is None:
+        return
+
+    product_ids = list(product_ids)
+    products = db.exec(select(Product).where(col(Product.id).in_(product_ids))).all()
+    found = {p.id for p in products}
+
+    for product in products:
+        index.upsert_product(product)
+    for product_id in product_ids:
+        if product_id not in found:
+            index.remove_product(product_id)
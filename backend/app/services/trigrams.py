@@ -0,0 +1,132 @@
+"""Нечёткий поиск по триграммам названий и брендов — fallback, когда FTS ничего не нашёл."""
+from collections import Counter
+from typing import Optional, Iterable, List, Dict, Set, FrozenSet
+import threading
+from sqlmodel import Session, select, col
+from app.models.product import Product
+from app.services.search import normalize_search_text, product_search_key
+
+# Минимальное сходство для попадания в результат (как pg_trgm.similarity_threshold)
+SIMILARITY_THRESHOLD = 0.3
+
+# Сколько кандидатов (по числу общих триграмм) оценивать точно
+MAX_CANDIDATES = 200
+
+
+def word_trigrams(word: str) -> FrozenSet[str]:
+    """Триграммы слова с границами"""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Сходство Жаккара двух множеств триграмм"""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class TrigramIndex:
+    """Инвертированный триграммный индекс активных товаров"""
+
+    def __init__(self, products: List[Product]):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Set[int]] = {}
+        self._words: Dict[int, List[FrozenSet[str]]] = {}
+        for product in products:
+            self._add(product)
+
+    def search(self, q: str, limit: int = 100) -> Dict[int, float]:
+        """{product_id: сходство} по убыванию сходства (не ниже SIMILARITY_THRESHOLD)"""
+        query_words = [word_trigrams(word) for word in normalize_search_text(q).split()]
+        if not query_words:
+            return {}
+
+        with self._lock:
+            shared = Counter()
+            for trigram in frozenset().union(*query_words):
+                shared.update(self._postings.get(trigram, ()))
+
+            scores = {}
+            for product_id, _ in shared.most_common(MAX_CANDIDATES):
+                words = self._words[product_id]
+                score = sum(
+                    max(similarity(query_word, word) for word in words) for query_word in query_words
+                ) / len(query_words)
+                if score >= SIMILARITY_THRESHOLD:
+                    scores[product_id] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return dict(ranked)
+
+    def upsert(self, product: Product) -> None:
+        with self._lock:
+            self._remove(product.id)
+            if product.is_active:
+                self._add(product)
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def _add(self, product: Product) -> None:
+        words = [word_trigrams(word) for word in product_search_key(product).split()]
+        if not words:
+            return
+        self._words[product.id] = words
+        for trigram in frozenset().union(*words):
+            self._postings.setdefault(trigram, set()).add(product.id)
+
+    def _remove(self, product_id: int) -> None:
+        words = self._words.pop(product_id, None)
+        if not words:
+            return
+        for trigram in frozenset().union(*words):
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                postings.discard(product_id)
+                if not postings:
+                    del self._postings[trigram]
+
+
+# === Глобальный индекс процесса ===
+
+_index: Optional[TrigramIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_trigram_index(db: Session) -> TrigramIndex:
+    """Индекс (строится при первом обращении)"""
+    global _index
+
+    index = _index
+    if index is not None:
+        return index
+
+    with _index_lock:
+        if _index is None:
+            _index = TrigramIndex(db.exec(select(Product).where(Product.is_active == True)).all())
+        return _index
+
+
+def patch_trigram_index(db: Session, product_ids: Iterable[int]) -> None:
+    """Обновить триграммы изменённых/удалённых товаров"""
+    index = _index
+    if index is None:
+        return
+
+    product_ids = list(product_ids)
+    products = db.exec(select(Product).where(col(Product.id).in_(product_ids))).all()
+    found = {p.id for p in products}
+
+    for product in products:
+        index.upsert(product)
+    for product_id in product_ids:
+        if product_id not in found:
+            index.remove(product_id)
+
+
+def fuzzy_product_ids(db: Session, q: str, limit: int = 100) -> Dict[int, float]:
+    """Товары, похожие на q с учётом опечаток: {product_id: сходство}"""
+    return get_trigram_index(db).search(q, limit)
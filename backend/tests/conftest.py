@@ -0,0 +1,23 @@
+from decimal import Decimal
+from typing import List, Optional, Tuple
+import pytest
+from app.models.promotion import Promotion
+from app.services.pricing import get_applicable_promotions, select_best_promotion, calculate_discount
+
+
+def decimal_price(product, promotions: List[Promotion]) -> Tuple[Decimal, Optional[int]]:
+    """Эталон: прежний Decimal-расчёт цены товара через select_best_promotion и calculate_discount"""
+    if product.old_price and product.old_price > product.price:
+        return product.price, int(((product.old_price - product.price) / product.old_price) * 100)
+
+    best = select_best_promotion(product.price, get_applicable_promotions(product, promotions))
+    if best is None:
+        return product.price, None
+    final_price = calculate_discount(product.price, best)
+    discount_percent = int(((product.price - final_price) / product.price) * 100)
+    return final_price.quantize(Decimal("0.01")), discount_percent
+
+
+@pytest.fixture
+def reference_price():
+    return decimal_price
@@ -0,0 +1,55 @@
+"""Фасеты in-memory индекса: drill-down по группам и суммы категорий по поддереву"""
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from app.services.catalog_index import CatalogIndex
+
+# Дерево: 1 (уход) -> 2 (лицо) -> 3 (кремы); 4 (волосы) отдельно
+SUBTREES = {"care": {1, 2, 3}, "face": {2, 3}, "creams": {3}, "hair": {4}}
+ANCESTORS = {1: [1], 2: [1, 2], 3: [1, 2, 3], 4: [4]}
+
+
+@pytest.fixture
+def index():
+    products = [
+        SimpleNamespace(
+            id=i, category_id=[1, 2, 3, 4][i % 4], price=Decimal(100 * i), final_price=Decimal(100 * i),
+            created_at=datetime(2024, 1, 1), in_stock=i % 2 == 0, is_featured=False, is_on_sale=i % 3 == 0,
+            name=f"Товар {i}", sales_7d=0, sales_30d=0, brand=["COSRX", "Missha"][i % 2],
+        )
+        for i in range(1, 13)
+    ]
+    return CatalogIndex(products, SUBTREES, datetime.max, ANCESTORS)
+
+
+def test_category_counts_roll_up_to_ancestors(index):
+    facets = index.facets()
+    assert facets["categories"] == [
+        {"category_id": 1, "count": 9},
+        {"category_id": 2, "count": 6},
+        {"category_id": 3, "count": 3},
+        {"category_id": 4, "count": 3},
+    ]
+
+
+def test_each_facet_ignores_its_own_filter(index):
+    facets = index.facets(category_slugs=["creams"], brands=["COSRX"], in_stock=True, max_price=Decimal(500))
+    # Категории — без фильтра по категории: COSRX в наличии до 500 -> id 2 и 4
+    assert facets["categories"] == [
+        {"category_id": 1, "count": 2},
+        {"category_id": 2, "count": 1},
+        {"category_id": 3, "count": 1},
+    ]
+    # Бренды — без фильтра по бренду: кремы (id 2, 6, 10) в наличии до 500 -> только id 2
+    assert facets["brands"] == [{"brand": "COSRX", "count": 1}]
+    # Цены — без фильтра по цене: кремы COSRX в наличии -> 2, 6, 10
+    assert (facets["price_min"], facets["price_max"]) == (Decimal(200), Decimal(1000))
+    assert sum(bucket["count"] for bucket in facets["price_histogram"]) == 3
+
+
+def test_facets_match_filter_counts(index):
+    filters = dict(brands=["Missha"], on_sale=True)
+    facets = index.facets(**filters)
+    assert facets["on_sale"] == index.count(index.filter(**filters))
+    assert facets["in_stock"] == index.count(index.filter(brands=["Missha"], in_stock=True, on_sale=True))
@@ -0,0 +1,60 @@
+"""Глобальный индекс каталога: запись во время построения не оставляет устаревший индекс"""
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from app.services import catalog_index
+from app.services.catalog_index import CatalogIndex, get_catalog_index, invalidate_catalog_index
+
+
+def _index():
+    products = [
+        SimpleNamespace(
+            id=i, category_id=1, price=Decimal(100), final_price=Decimal(100), created_at=datetime(2024, 1, 1),
+            in_stock=True, is_featured=False, is_on_sale=False, name=f"Товар {i}", sales_7d=0, sales_30d=0, brand=None,
+        )
+        for i in range(1, 4)
+    ]
+    return CatalogIndex(products, {}, datetime.max)
+
+
+@pytest.fixture(autouse=True)
+def reset_index():
+    invalidate_catalog_index()
+    yield
+    invalidate_catalog_index()
+
+
+def test_build_is_kept_without_writes(monkeypatch):
+    built = _index()
+    monkeypatch.setattr(catalog_index, "build_catalog_index", lambda db: built)
+    assert get_catalog_index(None) is built
+    assert catalog_index._index is built
+
+
+@pytest.mark.parametrize("write", [
+    lambda: invalidate_catalog_index(),
+    # Патч, пока индекса ещё нет (товар записан после чтения построителя)
+    lambda: catalog_index.patch_catalog_index(None, []),
+    lambda: catalog_index.patch_catalog_sales({1: {"sales_7d": 5, "sales_30d": 5}}),
+])
+def test_write_during_build_discards_result(monkeypatch, write):
+    built = _index()
+
+    def build(db):
+        write()
+        return built
+
+    monkeypatch.setattr(catalog_index, "build_catalog_index", build)
+    # Запрос получает построенный индекс, но глобально он не сохраняется
+    assert get_catalog_index(None) is built
+    assert catalog_index._index is None
+
+
+def test_lost_patch_race_resets_index():
+    index = catalog_index._index = _index()
+    first, second = index.copy(), index.copy()
+    catalog_index._replace_index(index, first)
+    # Второй патч сделан по старому индексу и не содержит первого
+    catalog_index._replace_index(index, second)
+    assert catalog_index._index is None
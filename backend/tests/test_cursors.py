@@ -0,0 +1,65 @@
+"""Курсоры keyset-пагинации: подделанные курсоры — 400, а не 500"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+import base64
+import json
+import pytest
+from fastapi import HTTPException
+from app.services.catalog_index import CatalogIndex
+from app.services.cursors import encode_cursor, decode_cursor
+
+
+def _raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.fixture
+def index():
+    created = datetime(2024, 1, 1)
+    products = [
+        SimpleNamespace(
+            id=i, category_id=1, price=Decimal(100 + i), final_price=Decimal(100 + i),
+            created_at=created + timedelta(hours=i), in_stock=True, is_featured=False, is_on_sale=False,
+            name=f"Товар {i}", sales_7d=i, sales_30d=i, brand=None,
+        )
+        for i in range(1, 6)
+    ]
+    return CatalogIndex(products, {}, datetime.max)
+
+
+@pytest.mark.parametrize("payload", [
+    ["price_asc", "NaN", 1],
+    ["price_asc", "sNaN", 1],
+    ["price_desc", "Infinity", 1],
+    ["price_asc", "-Infinity", 1],
+    ["relevance", "nan", 1],
+    ["relevance", "inf", 1],
+    ["popular", 10 ** 30, 1],
+    ["popular", True, 1],
+    ["name", "a", 10 ** 30],
+])
+def test_bad_cursor_is_400(payload, index):
+    cursor = _raw_cursor(payload)
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, payload[0])
+    assert error.value.status_code == 400
+
+    if payload[0] != "relevance":
+        with pytest.raises(HTTPException) as error:
+            index.page(index.all_bits, payload[0], 10, cursor=cursor)
+        assert error.value.status_code == 400
+
+
+def test_aware_datetime_cursor_is_normalized_to_utc(index):
+    cursor = _raw_cursor(["newest", "2024-01-01T05:00:00+02:00", 3])
+    assert decode_cursor(cursor, "newest") == (datetime(2024, 1, 1, 3), 3)
+    # Позиция после товара 3 (03:00) в порядке newest: дальше 2 и 1
+    assert [product_id for product_id, _ in index.page(index.all_bits, "newest", 10, cursor=cursor)] == [2, 1]
+
+
+def test_cursor_round_trip(index):
+    first = index.page(index.all_bits, "price_asc", 2)
+    product_id, key = first[-1]
+    rest = index.page(index.all_bits, "price_asc", 10, cursor=encode_cursor("price_asc", key, product_id))
+    assert [pid for pid, _ in first + rest] == [1, 2, 3, 4, 5]
@@ -0,0 +1,122 @@
+"""Целочисленное ядро цен против прежнего Decimal-расчёта"""
+from decimal import Decimal
+from types import SimpleNamespace
+import json
+import random
+import pytest
+from app.models.promotion import Promotion, PromotionType, PromotionScope
+from app.services import price_kernel
+from app.services.price_kernel import to_kopecks, from_kopecks
+from app.services.pricing import calculate_discount, price_products, price_products_kopecks, price_with_promotions
+
+PERCENT = PromotionType.PERCENT
+FIXED = PromotionType.FIXED
+
+
+def _promotion(type, value, scope=PromotionScope.ALL, priority=0, target_ids=None, id=1):
+    return Promotion(id=id, name="p", type=type, scope=scope, priority=priority, value=Decimal(value), target_ids=target_ids)
+
+
+def _product(price, old_price=None, id=1, category_id=1):
+    return SimpleNamespace(
+        id=id, category_id=category_id, price=Decimal(price),
+        old_price=Decimal(old_price) if old_price is not None else None,
+    )
+
+
+def _money(rnd: random.Random) -> Decimal:
+    kopecks = rnd.choice([rnd.randint(0, 500), rnd.randint(0, 100_000), rnd.randint(0, 10 ** 9)])
+    return Decimal(kopecks).scaleb(-2)
+
+
+def _random_promotions(rnd: random.Random):
+    promotions = []
+    for i in range(rnd.randint(0, 5)):
+        type = rnd.choice([PERCENT, FIXED])
+        if type == PERCENT:
+            # Доли процента, круглые проценты и больше 100%
+            value = Decimal(rnd.choice([rnd.randint(1, 10_000), rnd.randint(1, 100) * 100, rnd.randint(1, 15_000)])).scaleb(-2)
+        else:
+            value = _money(rnd)
+        scope = rnd.choice(list(PromotionScope))
+        target_ids = json.dumps(rnd.sample(range(1, 6), rnd.randint(1, 3))) if scope != PromotionScope.ALL else None
+        promotions.append(_promotion(type, value, scope, rnd.randint(0, 2), target_ids, id=i + 1))
+    return promotions
+
+
+def _random_products(rnd: random.Random, count: int):
+    return [
+        SimpleNamespace(
+            id=rnd.randint(1, 5), category_id=rnd.choice([None, 1, 2, 3, 4, 5]), price=_money(rnd),
+            old_price=rnd.choice([None, None, Decimal("0"), _money(rnd)]),
+        )
+        for _ in range(count)
+    ]
+
+
+# === Перевод и правила округления ===
+
+@pytest.mark.parametrize("value, kopecks", [
+    ("0", 0), ("0.01", 1), ("1", 100), ("99.99", 9999), ("120.5", 12050), ("1000000.00", 100000000),
+])
+def test_kopecks_round_trip(value, kopecks):
+    assert to_kopecks(Decimal(value)) == kopecks
+    assert from_kopecks(kopecks) == Decimal(value)
+    assert to_kopecks(None) is None
+
+
+@pytest.mark.parametrize("price, percent, expected", [
+    ("0.25", "10", "0.22"),   # 0.225 -> половина к чётному вниз
+    ("0.35", "10", "0.32"),   # 0.315 -> половина к чётному вверх
+    ("0.15", "10", "0.14"),   # 0.135 -> 0.14
+    ("0.05", "50", "0.02"),   # 0.025 -> 0.02
+    ("9.99", "33.33", "6.66"),
+])
+def test_percent_rounds_half_even(price, percent, expected):
+    promo = _promotion(PERCENT, percent)
+    final, _ = price_kernel.final_price(to_kopecks(Decimal(price)), None, [price_kernel.promotion_term(promo)])
+    assert from_kopecks(final) == Decimal(expected)
+    assert from_kopecks(final) == calculate_discount(Decimal(price), promo).quantize(Decimal("0.01"))
+
+
+def test_discount_percent_truncates_unrounded_price():
+    # 3.00 - 1.00 = 33.33...% -> 33
+    assert price_kernel.final_price(300, None, [(False, 100)]) == (200, 33)
+    # 0.25 - 10% = 0.225 (после округления 0.22 было бы 12%) -> 10
+    assert price_kernel.final_price(25, None, [(True, 1000)]) == (22, 10)
+
+
+def test_fixed_discount_not_below_zero():
+    assert price_kernel.final_price(500, None, [(False, 900)]) == (0, 100)
+
+
+def test_old_price_wins_over_promotions():
+    assert price_kernel.final_price(700, 1000, [(True, 5000)]) == (700, 30)
+    # old_price не выше цены — обычный расчёт по акциям
+    assert price_kernel.final_price(700, 700, [(True, 5000)]) == (350, 50)
+
+
+def test_tie_keeps_first_term():
+    # Обе акции дают 90.00 — применяется первая, как в select_best_promotion
+    assert price_kernel.final_price_with_term(10000, None, [(False, 1000), (True, 1000)]) == (9000, 10, 0)
+
+
+def test_zero_price_gets_no_discount():
+    assert price_kernel.final_price(0, None, [(True, 1000), (False, 100)]) == (0, None)
+
+
+# === Соответствие Decimal-расчёту ===
+
+@pytest.mark.parametrize("seed", range(20))
+def test_kernel_matches_decimal(seed, reference_price):
+    rnd = random.Random(seed)
+    for _ in range(500):
+        promotions = _random_promotions(rnd)
+        products = _random_products(rnd, 8)
+        expected = [reference_price(product, promotions) for product in products]
+
+        assert [price_with_promotions(product, promotions) for product in products] == expected
+        assert price_products(products, promotions) == expected
+        assert price_products_kopecks(products, promotions) == [
+            (to_kopecks(price), discount_percent) for price, discount_percent in expected
+        ]
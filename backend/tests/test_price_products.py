@@ -0,0 +1,97 @@
+"""price_products (пакетный расчёт) против поштучного select_best_promotion / calculate_discount"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+import json
+import random
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+from app.models.promotion import Promotion, PromotionType, PromotionScope
+from app.services.pricing import (
+    PromotionSnapshot, get_active_promotions, get_promotion_snapshot, invalidate_promotion_snapshot,
+    price_products, price_with_promotions,
+)
+from app.services.promotion_targets import set_promotion_targets
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    invalidate_promotion_snapshot()
+
+
+def _window(rnd: random.Random, now: datetime):
+    """(starts_at, ends_at): без границ, уже идёт, закончилась или ещё не началась"""
+    day = timedelta(days=1)
+    return rnd.choice([
+        (None, None),
+        (now - day, None),
+        (None, now + day),
+        (now - day, now + day),
+        (now - 2 * day, now - day),
+        (now + day, None),
+    ])
+
+
+def _random_promotions(rnd: random.Random, now: datetime):
+    promotions = []
+    for i in range(rnd.randint(0, 8)):
+        scope = rnd.choice(list(PromotionScope))
+        type = rnd.choice(list(PromotionType))
+        value = rnd.choice(["0", "5", "10", "15.5", "33.33", "50", "100", "120", "250"])
+        target_ids = None
+        if scope != PromotionScope.ALL:
+            # Повторы и мусор в target_ids — как в данных, введённых вручную
+            target_ids = rnd.choice([
+                json.dumps(rnd.sample(range(1, 8), rnd.randint(1, 3))),
+                json.dumps([rnd.randint(1, 7)] * 2),
+                "[]",
+            ])
+        starts_at, ends_at = _window(rnd, now)
+        promotions.append(Promotion(
+            code=f"P{i}", name=f"promo {i}", type=type, scope=scope, priority=rnd.randint(0, 2),
+            value=Decimal(value), target_ids=target_ids, starts_at=starts_at, ends_at=ends_at,
+            is_active=rnd.random() < 0.85,
+        ))
+    return promotions
+
+
+def _random_products(rnd: random.Random):
+    return [
+        SimpleNamespace(
+            id=product_id, category_id=rnd.choice([None, 1, 2, 3, 4]),
+            price=Decimal(rnd.choice(["0", "0.01", "0.25", "9.99", "100", "120", "499.50", "1000"])),
+            old_price=rnd.choice([None, None, Decimal("0"), Decimal("50"), Decimal("150"), Decimal("1500")]),
+        )
+        for product_id in range(1, 8)
+        for _ in range(rnd.randint(1, 3))
+    ]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_price_products_matches_per_product(seed, db, reference_price):
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    promotions = _random_promotions(rnd, now)
+    for promotion in promotions:
+        db.add(promotion)
+    db.flush()
+    for promotion in promotions:
+        set_promotion_targets(db, promotion)
+    db.commit()
+    invalidate_promotion_snapshot()
+
+    active = get_active_promotions(db)
+    snapshot = get_promotion_snapshot(db)
+    for _ in range(20):
+        products = _random_products(rnd)
+        expected = [reference_price(product, active) for product in products]
+
+        assert price_products(products, snapshot) == expected
+        assert price_products(products, active) == expected
+        assert price_products(products, PromotionSnapshot(active, datetime.max)) == expected
+        assert [price_with_promotions(product, snapshot) for product in products] == expected
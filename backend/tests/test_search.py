@@ -0,0 +1,34 @@
+"""Нормализация поискового текста: запрос-префикс не теряет букв"""
+import pytest
+from app.services.search import build_match_query, index_search_text, normalize_search_text
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Крем", "krem"),
+    ("ёлка", "elka"),
+    ("Innisfree", "inisfri"),
+    ("Иннисфри", "inisfri"),
+    ("perfect", "perfekt"),
+    ("shampoo", "shampu"),
+])
+def test_normalize(value, expected):
+    assert normalize_search_text(value) == expected
+
+
+@pytest.mark.parametrize("prefix, word", [
+    ("perfe", "perfect"),
+    ("shampo", "shampoo"),
+    ("inisfre", "innisfree"),
+    ("sop", "sophora"),
+    ("косри", "COSRX"),
+    ("cosr", "Косрикс"),
+])
+def test_typed_prefix_reaches_indexed_word(prefix, word):
+    indexed = index_search_text(word).split()
+    terms = build_match_query(prefix).strip("()").split(" OR ")
+    assert any(token.startswith(term.strip('"*')) for term in terms for token in indexed)
+
+
+def test_match_query_columns():
+    assert build_match_query("крем", columns=("name", "brand")) == '{name brand} : ("krem"*)'
+    assert build_match_query("  ") is None
@@ -5,6 +5,9 @@
 
 const API_BASE = '/api';
 
+// Максимум товаров в одном запросе /products/batch (MAX_BATCH_SIZE на бекенде)
+const BATCH_SIZE = 100;
+
 class ApiError extends Error {
     constructor(message, status, data = null) {
         super(message);
@@ -89,6 +92,56 @@ export const api = {
         return request(`/products/${slug}`);
     },
     
+    async getProductsBatch({ ids = [], slugs = [] } = {}) {
+        // Бекенд принимает не больше BATCH_SIZE товаров (ids + slugs) за запрос —
+        // делим на части и склеиваем ответы в исходном порядке
+        const keys = [
+            ...ids.map(id => ['ids', id]),
+            ...slugs.map(slug => ['slugs', slug]),
+        ];
+        const chunks = [];
+        for (let i = 0; i < keys.length; i += BATCH_SIZE) {
+            chunks.push(keys.slice(i, i + BATCH_SIZE));
+        }
+        if (chunks.length === 0) chunks.push([]);
+        
+        const responses = await Promise.all(chunks.map(chunk => {
+            const params = new URLSearchParams();
+            const chunkIds = chunk.filter(([key]) => key === 'ids').map(([, value]) => value);
+            const chunkSlugs = chunk.filter(([key]) => key === 'slugs').map(([, value]) => value);
+            if (chunkIds.length) params.set('ids', chunkIds.join(','));
+            if (chunkSlugs.length) params.set('slugs', chunkSlugs.join(','));
+            return request(`/products/batch?${params.toString()}`);
+        }));
+        
+        return {
+            items: responses.flatMap(response => response.items),
+            missing_ids: responses.flatMap(response => response.missing_ids || []),
+            missing_slugs: responses.flatMap(response => response.missing_slugs || []),
+        };
+    },
+    
+    async getSimilarProducts(slug, limit = 8) {
+        return request(`/products/${slug}/similar?limit=${limit}`);
+    },
+    
+    async getAlsoBought(ids, limit = 8) {
+        return request(`/products/also-bought?ids=${ids.join(',')}&limit=${limit}`);
+    },
+    
+    async getSuggestions(q, limit = 8) {
+        return request(`/products/suggest?q=${encodeURIComponent(q)}&limit=${limit}`);
+    },
+    
+    // Pages
+    async getHomePage() {
+        return request('/pages/home');
+    },
+    
+    async getProductPage(slug, related = 8) {
+        return request(`/pages/product/${slug}?related=${related}`);
+    },
+    
     // Categories
     async getCategories() {
         return request('/categories');
@@ -65,6 +65,35 @@ class App {
                 }
             });
             
+            // Autocomplete: подсказки из /products/suggest (без запросов к каталогу)
+            const suggestions = document.createElement('datalist');
+            suggestions.id = 'search-suggestions';
+            searchInput.after(suggestions);
+            searchInput.setAttribute('list', suggestions.id);
+            
+            let suggestTimeout;
+            searchInput.addEventListener('input', () => {
+                const query = searchInput.value.trim();
+                clearTimeout(suggestTimeout);
+                if (!query) {
+                    suggestions.innerHTML = '';
+                    return;
+                }
+                suggestTimeout = setTimeout(async () => {
+                    try {
+                        const items = await this.api.getSuggestions(query);
+                        suggestions.innerHTML = '';
+                        items.forEach(item => {
+                            const option = document.createElement('option');
+                            option.value = item.label;
+                            suggestions.appendChild(option);
+                        });
+                    } catch (e) {
+                        suggestions.innerHTML = '';
+                    }
+                }, 150);
+            });
+            
             // Search submit
             searchInput.addEventListener('keydown', (e) => {
                 if (e.key === 'Enter') {
@@ -133,12 +162,9 @@ class App {
         showProductsLoading(grid, 4);
         
         try {
-            const data = await this.api.getProducts({ 
-                page_size: 8,
-                sort: 'newest'
-            });
+            const data = await this.api.getHomePage();
             
-            renderProductsGrid(data.items, grid);
+            renderProductsGrid(data.new_arrivals, grid);
         } catch (e) {
             console.error('Failed to load products:', e);
             showToast('Не удалось загрузить товары', 'error');
@@ -3,7 +3,7 @@
  */
 
 import { cart, on } from './state.js';
-import { formatPrice, showToast, animatePulse } from './ui.js';
+import { formatPrice, showToast, animatePulse, renderProductCard, initProductCardHandlers } from './ui.js';
 import api from './api.js';
 
 // === DOM Elements ===
@@ -22,6 +22,8 @@ const elements = {
     summaryDiscount: document.getElementById('summary-discount'),
     summaryTotal: document.getElementById('summary-total'),
     checkoutBtn: document.getElementById('checkout-btn'),
+    alsoBought: document.getElementById('cart-also-bought'),
+    alsoBoughtGrid: document.getElementById('cart-also-bought-grid'),
 };
 
 // === Init ===
@@ -95,6 +97,21 @@ async function updateCartItemsData() {
     
     let needsUpdate = false;
     
+    // Все товары корзины одним запросом
+    const slugs = items.map(item => item.slug).filter(Boolean);
+    let productsBySlug = {};
+    if (slugs.length > 0) {
+        try {
+            const batch = await api.getProductsBatch({ slugs });
+            batch.items.forEach(product => {
+                productsBySlug[product.slug] = product;
+            });
+        } catch (error) {
+            console.error('Failed to load cart products:', error);
+            return;
+        }
+    }
+    
     for (const item of items) {
         // Всегда обновляем данные из API для актуальности
         // Особенно важно, если:
@@ -115,7 +132,7 @@ async function updateCartItemsData() {
                     continue;
                 }
                 
-                const product = await api.getProduct(productSlug);
+                const product = productsBySlug[productSlug];
                 
                 if (product) {
                     const basePrice = parseFloat(product.price) || 0;
@@ -173,12 +190,39 @@ function renderCart() {
     
     if (items.length === 0) {
         showEmptyCart();
+        loadAlsoBought([]);
         return;
     }
     
     showCartContent();
     renderItems(items);
     updateSummary();
+    loadAlsoBought(items);
+}
+
+// === Frequently Bought Together ===
+async function loadAlsoBought(items) {
+    if (!elements.alsoBought || !elements.alsoBoughtGrid) return;
+    
+    const ids = items.map(item => item.id).filter(Boolean);
+    if (ids.length === 0) {
+        elements.alsoBought.style.display = 'none';
+        return;
+    }
+    
+    try {
+        const products = await api.getAlsoBought(ids, 4);
+        if (products.length === 0) {
+            elements.alsoBought.style.display = 'none';
+            return;
+        }
+        elements.alsoBoughtGrid.innerHTML = products.map(p => renderProductCard(p)).join('');
+        initProductCardHandlers(elements.alsoBoughtGrid);
+        elements.alsoBought.style.display = '';
+    } catch (e) {
+        console.error('Failed to load recommendations:', e);
+        elements.alsoBought.style.display = 'none';
+    }
 }
 
 function showEmptyCart() {
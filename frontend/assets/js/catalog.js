@@ -28,6 +28,7 @@ let currentFilters = {
 
 let allProducts = [];
 let hasMoreProducts = false;
+let nextCursor = null; // keyset-курсор следующей порции (infinite scroll)
 
 let categories = [];
 
@@ -914,6 +915,11 @@ async function loadProducts(loadMore = false) {
             page: loadMore ? currentFilters.page + 1 : 1,
         };
         
+        // Следующие порции — по курсору: стоимость не растёт с глубиной
+        if (loadMore && nextCursor) {
+            params.cursor = nextCursor;
+        }
+        
         // Remove null values and empty arrays
         Object.keys(params).forEach(key => {
             if (params[key] === null || params[key] === undefined) {
@@ -924,6 +930,7 @@ async function loadProducts(loadMore = false) {
         });
         
         const data = await api.getProducts(params);
+        nextCursor = data.next_cursor || null;
         
         if (loadMore) {
             // Append to existing products
@@ -935,12 +942,14 @@ async function loadProducts(loadMore = false) {
             currentFilters.page = 1;
         }
         
-        hasMoreProducts = data.items.length === currentFilters.page_size && 
-                         allProducts.length < data.total;
+        hasMoreProducts = Boolean(nextCursor);
         
         renderProducts(allProducts);
         renderLoadMore();
-        updateProductsCount(data.total);
+        // В режиме cursor total не считается — количество берём из первой страницы
+        if (!loadMore) {
+            updateProductsCount(data.total);
+        }
         
         // Обновляем максимальную цену для слайдера из данных API (только при первой загрузке)
         if (!loadMore && data.max_price) {
@@ -60,30 +60,33 @@ async function loadFavorites() {
     
     // Загружаем полные данные товаров из API
     try {
-        const products = await Promise.all(
-            favoriteItems.map(async (item) => {
-                try {
-                    const product = await api.getProduct(item.slug);
-                    return product;
-                } catch (error) {
-                    console.error(`Failed to load product ${item.slug}:`, error);
-                    // Возвращаем базовые данные из localStorage
-                    return {
-                        id: item.id,
-                        name: item.name,
-                        slug: item.slug,
-                        price: item.price || 0,
-                        final_price: item.price || 0,
-                        old_price: null,
-                        discount_percent: null,
-                        is_featured: false,
-                        in_stock: true,
-                        primary_image: item.image || null,
-                        brand: null,
-                    };
-                }
-            })
-        );
+        const batch = await api.getProductsBatch({
+            slugs: favoriteItems.map(item => item.slug).filter(Boolean),
+        });
+        const productsBySlug = {};
+        batch.items.forEach(product => {
+            productsBySlug[product.slug] = product;
+        });
+        
+        const products = favoriteItems.map(item => {
+            const product = productsBySlug[item.slug];
+            if (product) return product;
+            
+            // Возвращаем базовые данные из localStorage
+            return {
+                id: item.id,
+                name: item.name,
+                slug: item.slug,
+                price: item.price || 0,
+                final_price: item.price || 0,
+                old_price: null,
+                discount_percent: null,
+                is_featured: false,
+                in_stock: true,
+                primary_image: item.image || null,
+                brand: null,
+            };
+        });
         
         // Рендерим карточки товаров (ТОЧНО КАК В КАТАЛОГЕ)
         renderProducts(products);
@@ -28,6 +28,7 @@ const elements = {
     stickyCheckoutBtn: document.getElementById('sticky-checkout-btn'),
     stickyCta: document.getElementById('sticky-cta'),
     relatedProducts: document.getElementById('related-products'),
+    alsoBoughtProducts: document.getElementById('also-bought-products'),
     imageModal: document.getElementById('image-modal'),
     imageModalImg: document.getElementById('image-modal-img'),
     imageModalClose: document.getElementById('image-modal-close'),
@@ -113,9 +114,12 @@ function initUI() {
 // === Load Product ===
 async function loadProduct(slug) {
     try {
-        product = await api.getProduct(slug);
+        // Товар, категории и похожие товары — одним запросом
+        const page = await api.getProductPage(slug);
+        product = page.product;
         renderProduct();
-        await loadRelatedProducts();
+        loadRelatedProducts(page.related);
+        loadAlsoBoughtProducts(page.also_bought);
     } catch (e) {
         console.error('Failed to load product:', e);
         showToast('Не вдалося завантажити товар', 'error');
@@ -593,41 +597,12 @@ function initStickyBar() {
 }
 
 // === Related Products ===
-async function loadRelatedProducts() {
+function loadRelatedProducts(relatedProducts = []) {
     if (!elements.relatedProducts || !product) return;
     
     try {
-        let related = [];
-        
-        // Алгоритм для "Вам також може сподобатися":
-        // 1. Сначала пытаемся загрузить товары из той же категории
-        if (product.category_name) {
-            const categoryData = await api.getProducts({ 
-                category: product.category_name, 
-                page_size: 12 
-            });
-            related = categoryData.items.filter(p => p.id !== product.id);
-        }
-        
-        // 2. Если недостаточно товаров из категории, добавляем featured товары
-        if (related.length < 6) {
-            const allData = await api.getProducts({ 
-                page_size: 20,
-                sort: 'newest'
-            });
-            
-            // Фильтруем: убираем текущий товар и уже добавленные
-            const available = allData.items.filter(
-                p => p.id !== product.id && !related.find(r => r.id === p.id)
-            );
-            
-            // Приоритет: featured товары, затем остальные
-            const featured = available.filter(p => p.is_featured);
-            const others = available.filter(p => !p.is_featured);
-            
-            // Добавляем featured, затем остальные
-            related = [...related, ...featured, ...others];
-        }
+        // Сервер уже упорядочил: та же категория, бренд, рекомендуемые, новинки
+        let related = relatedProducts.filter(p => p.id !== product.id);
         
         // Берем первые 6 товаров и немного перемешиваем для разнообразия
         related = related.slice(0, 8);
@@ -655,8 +630,18 @@ async function loadRelatedProducts() {
     }
 }
 
-function renderRelatedProducts(products) {
-    const grid = elements.relatedProducts.querySelector('.products-grid');
+// === Frequently Bought Together ===
+function loadAlsoBoughtProducts(products = []) {
+    if (!elements.alsoBoughtProducts || products.length === 0) return;
+    
+    // Секция скрыта по умолчанию — показываем, только если есть совместные покупки
+    const section = elements.alsoBoughtProducts.closest('.product-section');
+    if (section) section.style.display = '';
+    renderRelatedProducts(products, elements.alsoBoughtProducts);
+}
+
+function renderRelatedProducts(products, container = elements.relatedProducts) {
+    const grid = container.querySelector('.products-grid');
     if (!grid || products.length === 0) return;
     
     // Use EXACT same rendering logic as in catalog.js
@@ -377,16 +377,18 @@ async function loadBestsellers() {
     
     try {
         // Используем относительный путь для работы с HTTPS
-        const apiUrl = '/api/products?page_size=4&sort=newest';
+        // Все секции главной одним запросом (готовый снимок на сервере)
+        const apiUrl = '/api/pages/home';
         const res = await fetch(apiUrl, {
             credentials: 'include',
             mode: 'cors'
         });
         if (!res.ok) throw new Error('Failed to load');
         const data = await res.json();
+        const items = (data.new_arrivals || []).slice(0, 4);
         
-        if (data.items && data.items.length > 0) {
-            grid.innerHTML = data.items.map(p => renderProductCard(p)).join('');
+        if (items.length > 0) {
+            grid.innerHTML = items.map(p => renderProductCard(p)).join('');
             // Initialize handlers for dynamically created cards
             initAddToCart();
             // Update favorite button states first